@@ -19,17 +19,31 @@
 from __future__ import print_function
 from __future__ import division
 from __future__ import absolute_import
+import collections
+import functools
 import inspect
 import itertools
 import json
+from multiprocessing.pool import ThreadPool
+import threading
 import warnings
 
 import requests
 import six
+from six.moves import urllib
 
+import gitlab.cache
 import gitlab.config
+import gitlab.transport
 from gitlab.exceptions import *  # noqa
 from gitlab.objects import *  # noqa
+from gitlab.cache import ETagCache  # noqa
+from gitlab.cache import ObjectCache  # noqa
+from gitlab.cache import SQLiteCache  # noqa
+from gitlab.transport import Middleware  # noqa
+from gitlab.transport import RateLimiter  # noqa
+from gitlab.transport import RetryPolicy  # noqa
+from gitlab.transport import SingleFlight  # noqa
 
 __title__ = 'python-gitlab'
 __version__ = '0.13'
@@ -42,6 +56,19 @@ warnings.filterwarnings('default', category=DeprecationWarning,
                         module='^gitlab')
 
 
+_row_classes = {}
+
+
+def _row_class(cls, fields):
+    """Return the namedtuple class used for the `fields` records of `cls`."""
+    key = (cls, tuple(fields))
+    row_cls = _row_classes.get(key)
+    if row_cls is None:
+        row_cls = collections.namedtuple('%sRow' % cls.__name__, fields)
+        _row_classes[key] = row_cls
+    return row_cls
+
+
 def _sanitize(value):
     if isinstance(value, dict):
         return dict((k, _sanitize(v))
@@ -64,6 +91,35 @@ class Gitlab(object):
             the GitLab server.
         http_username: (str): Username for HTTP authentication
         http_password: (str): Password for HTTP authentication
+        pagination_workers (int): Number of pages to fetch concurrently when
+            listing all the items of a paginated resource.
+        pool_connections (int): Number of connection pools to cache (one per
+            host).
+        pool_maxsize (int): Maximum number of connections to keep in a pool.
+            Set it to at least the number of threads using the connection.
+        pool_block (bool): Whether to wait for a free connection when the
+            pool is full, instead of opening a connection that will be
+            discarded.
+        retry (RetryPolicy): Policy used to retry the requests failing with a
+            connection error or a transient HTTP error. No retry is performed
+            if None.
+        rate_limiter (RateLimiter): Limiter pacing all the requests sent to
+            the server. The requests are not paced if None.
+        middlewares (list): Middlewares to apply to all the requests, before
+            the retry policy and the rate limiter. See
+            `gitlab.transport.Middleware`.
+        cache (gitlab.Middleware): Cache for the GET requests, applied after
+            the `middlewares` (`gitlab.cache.ETagCache` or
+            `gitlab.cache.SQLiteCache`). The responses are not cached if None.
+        object_cache (gitlab.cache.ObjectCache): Identity map for the objects
+            retrieved with ``get()``. The objects are not cached if None.
+        bulk_workers (int): Default number of concurrent requests for the
+            bulk operations of the managers (``create_many()``...).
+        list_index_max_entries (int): Maximum number of listing indexes to
+            keep for the resources that can only be retrieved from their
+            listing. The least recently used indexes are dropped first.
+        list_index_max_age (float): Number of seconds a listing index can be
+            reused. Indexes never expire if None.
     Attributes:
         user_keys (UserKeyManager): Manager for GitLab users' SSH keys.
         users (UserManager): Manager for GitLab users
@@ -111,7 +167,11 @@ class Gitlab(object):
 
     def __init__(self, url, private_token=None, email=None, password=None,
                  ssl_verify=True, http_username=None, http_password=None,
-                 timeout=None):
+                 timeout=None, pagination_workers=1, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, retry=None,
+                 rate_limiter=None, middlewares=None, cache=None,
+                 object_cache=None, bulk_workers=1,
+                 list_index_max_entries=100, list_index_max_age=60):
 
         self._url = '%s/api/v3' % url
         #: Timeout to use for requests to gitlab server
@@ -127,9 +187,36 @@ class Gitlab(object):
         self.ssl_verify = ssl_verify
         self.http_username = http_username
         self.http_password = http_password
+        #: Number of pages to fetch concurrently when listing all the items
+        self.pagination_workers = pagination_workers
+        #: Identity map for the objects (gitlab.cache.ObjectCache)
+        self.object_cache = object_cache
+        #: Default number of concurrent requests for the bulk operations
+        self.bulk_workers = bulk_workers
+        #: Maximum number of listing indexes to keep
+        self.list_index_max_entries = list_index_max_entries
+        #: Number of seconds a listing index can be reused
+        self.list_index_max_age = list_index_max_age
+        # ID => object indexes of the 'from_list' classes, see BaseManager
+        self._list_indexes = collections.OrderedDict()
+        self._list_indexes_lock = threading.Lock()
+
+        #: Middlewares applied to all the requests, outermost first
+        self.middlewares = list(middlewares or [])
+        if cache is not None:
+            self.middlewares.append(cache)
+        if retry is not None:
+            self.middlewares.append(retry)
+        if rate_limiter is not None:
+            self.middlewares.append(rate_limiter)
 
         #: Create a session object for requests
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
         self.settings = ApplicationSettingsManager(self)
         self.user_keys = UserKeyManager(self)
@@ -179,10 +266,27 @@ class Gitlab(object):
         """
         config = gitlab.config.GitlabConfigParser(gitlab_id=gitlab_id,
                                                   config_files=config_files)
+        retry = None
+        if config.max_retries:
+            retry = RetryPolicy(max_retries=config.max_retries)
+        rate_limiter = None
+        if config.rate_limit:
+            rate_limiter = RateLimiter(config.rate_limit,
+                                       config.rate_limit_burst)
+        cache = None
+        if config.cache_path:
+            cache = SQLiteCache(config.cache_path,
+                                default_ttl=config.cache_ttl)
         return Gitlab(config.url, private_token=config.token,
                       ssl_verify=config.ssl_verify, timeout=config.timeout,
                       http_username=config.http_username,
-                      http_password=config.http_password)
+                      http_password=config.http_password,
+                      pagination_workers=config.pagination_workers,
+                      pool_connections=config.pool_connections,
+                      pool_maxsize=config.pool_maxsize,
+                      pool_block=config.pool_block, retry=retry,
+                      rate_limiter=rate_limiter, cache=cache,
+                      bulk_workers=config.bulk_workers)
 
     def auth(self):
         """Performs an authentication.
@@ -226,7 +330,9 @@ class Gitlab(object):
     def _construct_url(self, id_, obj, parameters):
         if 'next_url' in parameters:
             return parameters['next_url']
-        args = _sanitize(parameters)
+        # Only the URL placeholders need to be sanitized
+        args = dict((k, _sanitize(parameters[k])) for k in obj._url_keys
+                    if k in parameters)
         if id_ is None and obj._urlPlural is not None:
             url = obj._urlPlural % args
         else:
@@ -267,114 +373,241 @@ class Gitlab(object):
         self.email = email
         self.password = password
 
-    def _raw_get(self, path, content_type=None, **kwargs):
-        url = '%s%s' % (self._url, path)
-        headers = self._create_headers(content_type)
+    def _request(self, verb, url, params=None, data=None, headers=None,
+                 stream=False, obj_cls=None):
+        """Send an HTTP request to the GitLab server.
+
+        This is the single path used by all the requests. The request goes
+        through the middlewares defined in `middlewares`, in order, before
+        being sent by the session.
+
+        Args:
+            verb (str): The HTTP method.
+            url (str): The full URL of the request.
+            params (dict): The query string parameters.
+            data: The body of the request.
+            headers (dict): The HTTP headers.
+            stream (bool): Whether the response content should be streamed.
+            obj_cls: The `GitlabObject` class built from the response, if
+                any. Used by the caches to define the entries lifetime.
+
+        Returns:
+            requests.Response: The server response.
+
+        Raises:
+            GitlabConnectionError: If the server cannot be reached.
+        """
+        return self._run(gitlab.transport.Request(verb, url, params=params,
+                                                  data=data, headers=headers,
+                                                  stream=stream,
+                                                  obj_cls=obj_cls))
+
+    def _run(self, request):
+        """Send a `gitlab.transport.Request` through the middlewares."""
+        send = self._send
+        for middleware in reversed(self.middlewares):
+            send = functools.partial(middleware, send=send)
+        return send(request)
+
+    def _send(self, request):
         try:
-            return self.session.get(url,
-                                    params=kwargs,
-                                    headers=headers,
-                                    verify=self.ssl_verify,
-                                    timeout=self.timeout,
-                                    auth=requests.auth.HTTPBasicAuth(
-                                        self.http_username,
-                                        self.http_password))
+            return self.session.request(request.method, request.url,
+                                        params=request.params,
+                                        data=request.data,
+                                        headers=request.headers,
+                                        stream=request.stream,
+                                        verify=self.ssl_verify,
+                                        timeout=self.timeout,
+                                        auth=requests.auth.HTTPBasicAuth(
+                                            self.http_username,
+                                            self.http_password))
         except Exception as e:
             raise GitlabConnectionError(
                 "Can't connect to GitLab server (%s)" % e)
 
+    def _raw_get(self, path, content_type=None, streamed=False,
+                 obj_cls=None, **kwargs):
+        url = '%s%s' % (self._url, path)
+        headers = self._create_headers(content_type)
+        return self._request('get', url, params=kwargs, headers=headers,
+                             stream=streamed, obj_cls=obj_cls)
+
     def _raw_list(self, path, cls, **kwargs):
-        r = self._raw_get(path, **kwargs)
+        as_iterator = kwargs.pop('as_iterator', False)
+        fields = kwargs.pop('fields', None)
+        r = self._raw_get(path, obj_cls=cls, **kwargs)
         raise_error_from_response(r, GitlabListError)
 
+        get_all_results = kwargs.get('all', False) or as_iterator
+        results = self._iter_list(r, cls, self._cls_kwargs(kwargs),
+                                  get_all_results, fields)
+        return results if as_iterator else list(results)
+
+    def _cls_kwargs(self, kwargs):
         cls_kwargs = kwargs.copy()
 
         # Add _from_api manually, because we are not creating objects
         # through normal path
         cls_kwargs['_from_api'] = True
-        get_all_results = kwargs.get('all', False)
 
         # Remove parameters from kwargs before passing it to constructor
         for key in ['all', 'page', 'per_page', 'sudo', 'next_url']:
             if key in cls_kwargs:
                 del cls_kwargs[key]
 
-        results = [cls(self, item, **cls_kwargs) for item in r.json()
-                   if item is not None]
-        if ('next' in r.links and 'url' in r.links['next']
-           and get_all_results is True):
-            args = kwargs.copy()
-            args['next_url'] = r.links['next']['url']
-            results.extend(self.list(cls, **args))
-        return results
+        return cls_kwargs
+
+    def _get_next_page(self, url, obj_cls=None):
+        return self._run(self._next_page_request(url, obj_cls))
+
+    def _next_page_request(self, url, obj_cls=None):
+        return gitlab.transport.Request('get', url,
+                                        headers=self._create_headers(),
+                                        obj_cls=obj_cls)
+
+    def _page_objects(self, r, cls, cls_kwargs, fields=None):
+        """Build the objects of a listing page.
+
+        If `fields` is defined, light records holding only these fields are
+        built instead of `cls` objects.
+        """
+        items = [item for item in r.json() if item is not None]
+        if fields is None:
+            return [cls(self, item, **cls_kwargs) for item in items]
+        row_cls = _row_class(cls, fields)
+        return [row_cls(*[item.get(f) for f in fields]) for item in items]
+
+    def _iter_pages(self, r, cls, cls_kwargs, get_all_results, fields=None):
+        """Yield the objects of a listing as lists, one page at a time.
+
+        `r` is the response for the first page. When `get_all_results` is
+        True the ``next`` links are followed in a loop, so only the current
+        page is kept in memory.
+        """
+        while True:
+            yield self._page_objects(r, cls, cls_kwargs, fields)
+
+            next_url = r.links.get('next', {}).get('url')
+            if not get_all_results or next_url is None:
+                return
+
+            urls = None
+            if self.pagination_workers > 1:
+                urls = self._page_urls(next_url,
+                                       r.headers.get('X-Total-Pages'))
+            if urls:
+                for page in self._prefetch_pages(urls, cls, cls_kwargs,
+                                                 fields):
+                    yield page
+                return
+
+            # The next link already holds all the query parameters
+            r = self._get_next_page(next_url, cls)
+            raise_error_from_response(r, GitlabListError)
+
+    @staticmethod
+    def _page_urls(next_url, total_pages):
+        """Return the URLs of the remaining pages of a listing.
+
+        Returns None if the URLs cannot be built from the ``page`` parameter
+        of the ``next`` link and the ``X-Total-Pages`` header. The ``next``
+        links must be followed in this case.
+        """
+        try:
+            total_pages = int(total_pages)
+        except (TypeError, ValueError):
+            return None
+        parsed = urllib.parse.urlparse(next_url)
+        query = urllib.parse.parse_qs(parsed.query)
+        try:
+            first_page = int(query['page'][0])
+        except (KeyError, ValueError):
+            return None
+
+        def page_url(page):
+            query['page'] = [str(page)]
+            return urllib.parse.urlunparse(
+                parsed._replace(query=urllib.parse.urlencode(query, True)))
+
+        return [page_url(page)
+                for page in range(first_page, total_pages + 1)] or None
+
+    def _prefetch_pages(self, urls, cls, cls_kwargs, fields=None):
+        """Fetch the pages concurrently, and yield them in order.
+
+        The pages are requested in batches of `pagination_workers` pages.
+        """
+        workers = self.pagination_workers
+        get_page = functools.partial(self._get_next_page, obj_cls=cls)
+        pool = ThreadPool(workers)
+        try:
+            for i in range(0, len(urls), workers):
+                for r in pool.map(get_page, urls[i:i + workers]):
+                    raise_error_from_response(r, GitlabListError)
+                    yield self._page_objects(r, cls, cls_kwargs, fields)
+        finally:
+            pool.close()
+
+    def _iter_list(self, r, cls, cls_kwargs, get_all_results, fields=None):
+        return itertools.chain.from_iterable(
+            self._iter_pages(r, cls, cls_kwargs, get_all_results, fields))
 
     def _raw_post(self, path, data=None, content_type=None, **kwargs):
         url = '%s%s' % (self._url, path)
         headers = self._create_headers(content_type)
-        try:
-            return self.session.post(url, params=kwargs, data=data,
-                                     headers=headers,
-                                     verify=self.ssl_verify,
-                                     timeout=self.timeout,
-                                     auth=requests.auth.HTTPBasicAuth(
-                                         self.http_username,
-                                         self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
+        return self._request('post', url, params=kwargs, data=data,
+                             headers=headers)
 
     def _raw_put(self, path, data=None, content_type=None, **kwargs):
         url = '%s%s' % (self._url, path)
         headers = self._create_headers(content_type)
-
-        try:
-            return self.session.put(url, data=data, params=kwargs,
-                                    headers=headers,
-                                    verify=self.ssl_verify,
-                                    timeout=self.timeout,
-                                    auth=requests.auth.HTTPBasicAuth(
-                                        self.http_username,
-                                        self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
+        return self._request('put', url, params=kwargs, data=data,
+                             headers=headers)
 
     def _raw_delete(self, path, content_type=None, **kwargs):
         url = '%s%s' % (self._url, path)
         headers = self._create_headers(content_type)
-
-        try:
-            return self.session.delete(url,
-                                       params=kwargs,
-                                       headers=headers,
-                                       verify=self.ssl_verify,
-                                       timeout=self.timeout,
-                                       auth=requests.auth.HTTPBasicAuth(
-                                           self.http_username,
-                                           self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
+        return self._request('delete', url, params=kwargs, headers=headers)
 
     def list(self, obj_class, **kwargs):
         """Request the listing of GitLab resources.
 
         Args:
             obj_class (object): The class of resource to request.
+            as_iterator (bool): If True, return a generator that yields the
+                objects as the pages are retrieved, following the pagination
+                links. Only one page is kept in memory.
+            fields (list[str]): If defined, return light namedtuple records
+                holding only these fields instead of `obj_class` objects.
             **kwargs: Additional arguments to send to GitLab.
 
         Returns:
-            list(obj_class): A list of objects of class `obj_class`.
+            list(obj_class): A list of objects of class `obj_class` (or
+                records if `fields` is defined), or a generator if
+                `as_iterator` is True.
 
         Raises:
             GitlabConnectionError: If the server cannot be reached.
             GitlabListError: If the server fails to perform the request.
         """
-        missing = []
-        for k in itertools.chain(obj_class.requiredUrlAttrs,
-                                 obj_class.requiredListAttrs):
-            if k not in kwargs:
-                missing.append(k)
+        as_iterator = kwargs.pop('as_iterator', False)
+        fields = kwargs.pop('fields', None)
+        request = self._list_request(obj_class, kwargs)
+        r = self._run(request)
+        raise_error_from_response(r, GitlabListError)
+
+        get_all_results = request.params.get('all', False) or as_iterator
+        results = self._iter_list(r, obj_class, self._cls_kwargs(kwargs),
+                                  get_all_results, fields)
+        return results if as_iterator else list(results)
+
+    def _list_request(self, obj_class, kwargs):
+        """Build the request for the first page of a listing.
+
+        The requests are built separately from their sending so that the
+        same path is used by the asynchronous interface (`gitlab.aio`).
+        """
+        missing = [k for k in obj_class._list_required if k not in kwargs]
         if missing:
             raise GitlabListError('Missing attribute(s): %s' %
                                   ", ".join(missing))
@@ -391,41 +624,8 @@ class Gitlab(object):
         # Also remove the next-url attribute that make queries fail
         if 'next_url' in params:
             del params['next_url']
-        try:
-            r = self.session.get(url, params=params, headers=headers,
-                                 verify=self.ssl_verify,
-                                 timeout=self.timeout,
-                                 auth=requests.auth.HTTPBasicAuth(
-                                     self.http_username,
-                                     self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
-
-        raise_error_from_response(r, GitlabListError)
-
-        cls = obj_class
-        cls_kwargs = kwargs.copy()
-
-        # Add _from_api manually, because we are not creating objects
-        # through normal path
-        cls_kwargs['_from_api'] = True
-
-        get_all_results = params.get('all', False)
-
-        # Remove parameters from kwargs before passing it to constructor
-        for key in ['all', 'page', 'per_page', 'sudo', 'next_url']:
-            if key in cls_kwargs:
-                del cls_kwargs[key]
-
-        results = [cls(self, item, **cls_kwargs) for item in r.json()
-                   if item is not None]
-        if ('next' in r.links and 'url' in r.links['next']
-           and get_all_results is True):
-            args = kwargs.copy()
-            args['next_url'] = r.links['next']['url']
-            results.extend(self.list(obj_class, **args))
-        return results
+        return gitlab.transport.Request('get', url, params=params,
+                                        headers=headers, obj_cls=obj_class)
 
     def get(self, obj_class, id=None, **kwargs):
         """Request a GitLab resources.
@@ -442,11 +642,15 @@ class Gitlab(object):
             GitlabConnectionError: If the server cannot be reached.
             GitlabGetError: If the server fails to perform the request.
         """
-        missing = []
-        for k in itertools.chain(obj_class.requiredUrlAttrs,
-                                 obj_class.requiredGetAttrs):
-            if k not in kwargs:
-                missing.append(k)
+        r = self._get_response(obj_class, id, kwargs)
+        raise_error_from_response(r, GitlabGetError)
+        return r.json()
+
+    def _get_response(self, obj_class, id, kwargs, headers={}):
+        return self._run(self._get_request(obj_class, id, kwargs, headers))
+
+    def _get_request(self, obj_class, id, kwargs, headers={}):
+        missing = [k for k in obj_class._get_required if k not in kwargs]
         if missing:
             raise GitlabGetError('Missing attribute(s): %s' %
                                  ", ".join(missing))
@@ -454,7 +658,7 @@ class Gitlab(object):
         sanitized_id = _sanitize(id)
         url = self._construct_url(id_=sanitized_id, obj=obj_class,
                                   parameters=kwargs)
-        headers = self._create_headers()
+        headers = self._create_headers(headers=headers)
 
         # Remove attributes that are used in url so that there is only
         # url-parameters left
@@ -462,18 +666,8 @@ class Gitlab(object):
         for attribute in obj_class.requiredUrlAttrs:
             del params[attribute]
 
-        try:
-            r = self.session.get(url, params=params, headers=headers,
-                                 verify=self.ssl_verify, timeout=self.timeout,
-                                 auth=requests.auth.HTTPBasicAuth(
-                                     self.http_username,
-                                     self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
-
-        raise_error_from_response(r, GitlabGetError)
-        return r.json()
+        return gitlab.transport.Request('get', url, params=params,
+                                        headers=headers, obj_cls=obj_class)
 
     def delete(self, obj, id=None, **kwargs):
         """Delete an object on the GitLab server.
@@ -492,6 +686,11 @@ class Gitlab(object):
             GitlabConnectionError: If the server cannot be reached.
             GitlabDeleteError: If the server fails to perform the request.
         """
+        r = self._run(self._delete_request(obj, id, kwargs))
+        raise_error_from_response(r, GitlabDeleteError)
+        return True
+
+    def _delete_request(self, obj, id, kwargs):
         if inspect.isclass(obj):
             if not issubclass(obj, GitlabObject):
                 raise GitlabError("Invalid class: %s" % obj)
@@ -500,8 +699,7 @@ class Gitlab(object):
         params.update(kwargs)
 
         missing = []
-        for k in itertools.chain(obj.requiredUrlAttrs,
-                                 obj.requiredDeleteAttrs):
+        for k in obj._delete_required:
             if k not in params:
                 try:
                     params[k] = getattr(obj, k)
@@ -511,6 +709,8 @@ class Gitlab(object):
             raise GitlabDeleteError('Missing attribute(s): %s' %
                                     ", ".join(missing))
 
+        self._invalidate_object(obj, params)
+
         obj_id = params[obj.idAttr] if obj._id_in_delete_url else None
         url = self._construct_url(id_=obj_id, obj=obj, parameters=params)
         headers = self._create_headers()
@@ -524,21 +724,59 @@ class Gitlab(object):
             # string
             params.pop(obj.idAttr)
 
-        try:
-            r = self.session.delete(url,
-                                    params=params,
-                                    headers=headers,
-                                    verify=self.ssl_verify,
-                                    timeout=self.timeout,
-                                    auth=requests.auth.HTTPBasicAuth(
-                                        self.http_username,
-                                        self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
+        return gitlab.transport.Request('delete', url, params=params,
+                                        headers=headers)
 
-        raise_error_from_response(r, GitlabDeleteError)
-        return True
+    def _invalidate_object(self, obj, params):
+        cls = obj if inspect.isclass(obj) else type(obj)
+        if self.object_cache is not None:
+            self.object_cache.invalidate(cls, params.get(obj.idAttr), params)
+        if cls.canGet == 'from_list':
+            self._clear_list_indexes(cls, params)
+
+    def _list_index_key(self, cls, args):
+        """Return the key of the listing index of `cls` objects.
+
+        The key starts with the class and the values of the URL attributes,
+        followed by the other listing arguments.
+        """
+        url_attrs = tuple(str(args.get(a)) for a in cls.requiredUrlAttrs)
+        others = tuple(sorted((k, str(v)) for k, v in args.items()
+                              if k not in cls.requiredUrlAttrs))
+        return (cls, url_attrs, others)
+
+    def _get_list_index(self, key):
+        """Return a listing index, or None if it is missing or too old."""
+        with self._list_indexes_lock:
+            entry = self._list_indexes.pop(key, None)
+            if entry is None:
+                return None
+            if (self.list_index_max_age is not None and
+                    gitlab.transport._clock() - entry[0] >
+                    self.list_index_max_age):
+                return None
+            self._list_indexes[key] = entry
+            return entry[1]
+
+    def _put_list_index(self, key, index):
+        """Store a listing index, dropping the least recently used ones."""
+        with self._list_indexes_lock:
+            self._list_indexes.pop(key, None)
+            self._list_indexes[key] = (gitlab.transport._clock(), index)
+            while len(self._list_indexes) > self.list_index_max_entries:
+                self._list_indexes.popitem(last=False)
+
+    def _clear_list_indexes(self, cls, params=None):
+        """Remove the listing indexes of `cls` objects.
+
+        If `params` is defined, only the indexes of the listings with the
+        same URL attributes (the same parent object) are removed.
+        """
+        prefix = self._list_index_key(cls, params or {})[:2]
+        with self._list_indexes_lock:
+            for key in list(self._list_indexes):
+                if key[0] is cls and (params is None or key[:2] == prefix):
+                    del self._list_indexes[key]
 
     def create(self, obj, **kwargs):
         """Create an object on the GitLab server.
@@ -558,37 +796,26 @@ class Gitlab(object):
             GitlabConnectionError: If the server cannot be reached.
             GitlabCreateError: If the server fails to perform the request.
         """
+        r = self._run(self._create_request(obj, kwargs))
+        raise_error_from_response(r, GitlabCreateError, 201)
+        return r.json()
+
+    def _create_request(self, obj, kwargs):
         params = obj.__dict__.copy()
         params.update(kwargs)
-        missing = []
-        for k in itertools.chain(obj.requiredUrlAttrs,
-                                 obj.requiredCreateAttrs):
-            if k not in params:
-                missing.append(k)
+        missing = [k for k in obj._create_required if k not in params]
         if missing:
             raise GitlabCreateError('Missing attribute(s): %s' %
                                     ", ".join(missing))
+        self._invalidate_object(obj, params)
 
         url = self._construct_url(id_=None, obj=obj, parameters=params)
         headers = self._create_headers(content_type="application/json")
 
         # build data that can really be sent to server
         data = obj._data_for_gitlab(extra_parameters=kwargs)
-
-        try:
-            r = self.session.post(url, data=data,
-                                  headers=headers,
-                                  verify=self.ssl_verify,
-                                  timeout=self.timeout,
-                                  auth=requests.auth.HTTPBasicAuth(
-                                      self.http_username,
-                                      self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
-
-        raise_error_from_response(r, GitlabCreateError, 201)
-        return r.json()
+        return gitlab.transport.Request('post', url, data=data,
+                                        headers=headers)
 
     def update(self, obj, **kwargs):
         """Update an object on the GitLab server.
@@ -608,40 +835,27 @@ class Gitlab(object):
             GitlabConnectionError: If the server cannot be reached.
             GitlabUpdateError: If the server fails to perform the request.
         """
+        r = self._run(self._update_request(obj, kwargs))
+        raise_error_from_response(r, GitlabUpdateError)
+        return r.json()
+
+    def _update_request(self, obj, kwargs):
         params = obj.__dict__.copy()
         params.update(kwargs)
-        missing = []
-        if obj.requiredUpdateAttrs or obj.optionalUpdateAttrs:
-            required_attrs = obj.requiredUpdateAttrs
-        else:
-            required_attrs = obj.requiredCreateAttrs
-        for k in itertools.chain(obj.requiredUrlAttrs, required_attrs):
-            if k not in params:
-                missing.append(k)
+        missing = [k for k in obj._update_required if k not in params]
         if missing:
             raise GitlabUpdateError('Missing attribute(s): %s' %
                                     ", ".join(missing))
+        self._invalidate_object(obj, params)
+
         obj_id = params[obj.idAttr] if obj._id_in_update_url else None
         url = self._construct_url(id_=obj_id, obj=obj, parameters=params)
         headers = self._create_headers(content_type="application/json")
 
         # build data that can really be sent to server
         data = obj._data_for_gitlab(extra_parameters=kwargs, update=True)
-
-        try:
-            r = self.session.put(url, data=data,
-                                 headers=headers,
-                                 verify=self.ssl_verify,
-                                 timeout=self.timeout,
-                                 auth=requests.auth.HTTPBasicAuth(
-                                     self.http_username,
-                                     self.http_password))
-        except Exception as e:
-            raise GitlabConnectionError(
-                "Can't connect to GitLab server (%s)" % e)
-
-        raise_error_from_response(r, GitlabUpdateError)
-        return r.json()
+        return gitlab.transport.Request('put', url, data=data,
+                                        headers=headers)
 
     def Hook(self, id=None, **kwargs):
         """Creates/tests/lists system hook(s) known by the GitLab server.
@@ -0,0 +1,674 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""asyncio interface to the GitLab API (Python 3.7+).
+
+The requests are sent by a small HTTP/1.1 client built on the asyncio
+streams: no thread is used, and many requests can be in flight at the same
+time on a single event loop. The requests are built by the `gitlab.Gitlab`
+object, so the URLs, headers and parameters are the same as with the
+synchronous interface.
+"""
+
+import asyncio
+import collections
+import functools
+import os
+import ssl
+import urllib.parse
+import zlib
+
+import requests
+
+from gitlab.exceptions import *  # noqa
+from gitlab.objects import BaseManager
+from gitlab.transport import RateLimiter
+from gitlab.transport import RetryPolicy
+
+
+class AsyncGitlab(object):
+    """Asynchronous interface to a `gitlab.Gitlab` object.
+
+    The managers of the wrapped object are available as attributes, and
+    their methods are coroutines::
+
+        async with AsyncGitlab(gl, max_connections=32) as agl:
+            project = await agl.projects.get(1)
+            async for issue in agl.manager(project.issues).iter():
+                print(issue.title)
+
+    The `RetryPolicy` and `RateLimiter` middlewares of `gl` are applied to
+    the requests without blocking the event loop. The other middlewares of
+    `gl` are blocking and are not used; asynchronous middlewares can be
+    defined with `middlewares` instead. Proxies are not supported.
+
+    Args:
+        gl (gitlab.Gitlab): The GitLab connection to use. Its URL, token,
+            SSL and timeout settings are used.
+        max_connections (int): Maximum number of requests sent at the same
+            time. The connections are kept open and reused.
+        middlewares (list): Asynchronous middlewares, outermost first. A
+            middleware is a coroutine function receiving the
+            `gitlab.transport.Request` and the `send` coroutine function of
+            the next element of the chain.
+    """
+
+    def __init__(self, gl, max_connections=10, middlewares=None):
+        self.gitlab = gl
+        #: Middlewares applied to all the requests, outermost first
+        self.middlewares = list(middlewares or [])
+        for middleware in gl.middlewares:
+            if isinstance(middleware, RetryPolicy):
+                self.middlewares.append(AsyncRetryPolicy(middleware))
+            elif isinstance(middleware, RateLimiter):
+                self.middlewares.append(AsyncRateLimiter(middleware))
+        self._transport = _Transport(gl, max_connections)
+
+    def __getattr__(self, name):
+        attr = getattr(self.gitlab, name)
+        if not isinstance(attr, BaseManager):
+            raise AttributeError(name)
+        manager = self.manager(attr)
+        self.__dict__[name] = manager
+        return manager
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, request):
+        """Send a `gitlab.transport.Request` through the middlewares."""
+        send = self._transport.send
+        for middleware in reversed(self.middlewares):
+            send = functools.partial(middleware, send=send)
+        return await send(request)
+
+    def manager(self, manager):
+        """Return an asynchronous interface for a manager.
+
+        Use this method for the managers of the GitLab objects, for example
+        ``agl.manager(project.issues)``.
+
+        Args:
+            manager (BaseManager): The manager to wrap.
+
+        Returns:
+            AsyncManager: The wrapped manager.
+        """
+        return AsyncManager(self, manager)
+
+    async def _fetch_pending(self, obj):
+        # Retrieve the attributes of an object returned by a lazy get
+        pending = obj.__dict__.pop('_pending_get', None)
+        if pending is None:
+            return
+        id, kwargs = pending
+        try:
+            r = await self._run(self.gitlab._get_request(type(obj), id,
+                                                         kwargs))
+            data = obj._data_from_response(r)
+        except BaseException:
+            obj._pending_get = pending
+            raise
+        obj._set_pending_data(data)
+
+    async def save(self, obj, **kwargs):
+        """Create or update an object on the server.
+
+        Returns:
+            object: The saved object.
+
+        Raises:
+            GitlabCreateError: If the server fails to create the object.
+            GitlabUpdateError: If the server fails to update the object.
+        """
+        gl = self.gitlab
+        await self._fetch_pending(obj)
+        if obj._from_api:
+            if obj._prepare_update(kwargs):
+                r = await self._run(gl._update_request(obj, kwargs))
+                raise_error_from_response(r, GitlabUpdateError)
+                obj._set_updated(r.json())
+        else:
+            if not obj.canCreate:
+                raise NotImplementedError
+            r = await self._run(gl._create_request(obj, kwargs))
+            raise_error_from_response(r, GitlabCreateError, 201)
+            obj._set_created(r.json())
+        return obj
+
+    async def delete(self, obj, **kwargs):
+        """Delete an object on the server.
+
+        Returns:
+            bool: True if the operation succeeds.
+
+        Raises:
+            GitlabDeleteError: If the server fails to perform the request.
+        """
+        if not obj.canDelete:
+            raise NotImplementedError
+        if not obj._from_api:
+            raise GitlabDeleteError("Object not yet created")
+        r = await self._run(self.gitlab._delete_request(obj, None, kwargs))
+        raise_error_from_response(r, GitlabDeleteError)
+        return True
+
+    async def close(self):
+        """Close the idle connections."""
+        await self._transport.close()
+
+
+class AsyncManager(object):
+    """Asynchronous interface to a `BaseManager`.
+
+    The parent arguments of the wrapped manager (``project_id``...) are
+    applied as with the synchronous manager.
+    """
+
+    def __init__(self, agl, manager):
+        self.agl = agl
+        self.manager = manager
+
+    @property
+    def obj_cls(self):
+        return self.manager.obj_cls
+
+    async def get(self, id=None, **kwargs):
+        """Get a GitLab object.
+
+        The objects that can only be found in a listing are searched page
+        by page. If the Gitlab connection has an object cache, it is used
+        as with the synchronous interface.
+
+        Returns:
+            object: An object of class `obj_cls`.
+
+        Raises:
+            NotImplementedError: If objects cannot be retrieved.
+            GitlabGetError: If the server fails to perform the request.
+        """
+        cls = self.obj_cls
+        gl = self.agl.gitlab
+        if not cls.canGet:
+            raise NotImplementedError
+        if cls.canGet == 'from_list':
+            async for obj in self.iter(**kwargs):
+                if str(getattr(obj, obj.idAttr)) == str(id):
+                    return obj
+            raise GitlabGetError("Object not found")
+
+        args = self.manager._set_parent_args(**kwargs)
+        cache = gl.object_cache
+        key = None
+        # Requests with extra parameters (sudo...) are not cached
+        if cache is not None and set(args) <= set(cls.requiredUrlAttrs):
+            key = cache.key(cls, id, args)
+            obj = cache.get(key)
+            if obj is not None:
+                return obj
+        r = await self.agl._run(gl._get_request(cls, id, args))
+        obj = cls._from_response(gl, r, **args)
+        if key is not None:
+            cache.put(key, obj)
+        return obj
+
+    async def list(self, **kwargs):
+        """Get a list of GitLab objects.
+
+        With ``all=True``, the remaining pages are requested concurrently
+        when their URLs can be built from the first page, and the ``next``
+        links are followed otherwise.
+
+        Returns:
+            list[object]: A list of `obj_cls` objects, or of records if
+                `fields` is defined.
+
+        Raises:
+            NotImplementedError: If objects cannot be listed.
+            GitlabListError: If the server fails to perform the request.
+        """
+        args = self._list_args(kwargs)
+        fields = args.pop('fields', None)
+        gl = self.agl.gitlab
+        cls = self.obj_cls
+        request = gl._list_request(cls, args)
+        r = await self.agl._run(request)
+        raise_error_from_response(r, GitlabListError)
+        cls_kwargs = gl._cls_kwargs(args)
+        objects = gl._page_objects(r, cls, cls_kwargs, fields)
+
+        next_url = r.links.get('next', {}).get('url')
+        if not request.params.get('all', False) or next_url is None:
+            return objects
+
+        urls = gl._page_urls(next_url, r.headers.get('X-Total-Pages'))
+        if urls:
+            responses = await asyncio.gather(
+                *[self.agl._run(gl._next_page_request(url, cls))
+                  for url in urls])
+        else:
+            responses = []
+            while next_url is not None:
+                r = await self.agl._run(gl._next_page_request(next_url,
+                                                              cls))
+                raise_error_from_response(r, GitlabListError)
+                responses.append(r)
+                next_url = r.links.get('next', {}).get('url')
+        for r in responses:
+            raise_error_from_response(r, GitlabListError)
+            objects.extend(gl._page_objects(r, cls, cls_kwargs, fields))
+        return objects
+
+    def iter(self, **kwargs):
+        """Iterate over all the objects, page by page.
+
+        The next page is only requested when the objects of the current
+        page have been consumed.
+
+        Returns:
+            AsyncListIterator: An asynchronous iterator over the objects.
+
+        Raises:
+            NotImplementedError: If objects cannot be listed.
+        """
+        args = self._list_args(kwargs)
+        fields = args.pop('fields', None)
+        return AsyncListIterator(self.agl, self.obj_cls, args, fields)
+
+    def _list_args(self, kwargs):
+        cls = self.obj_cls
+        if not cls.canList or not cls._url:
+            raise NotImplementedError
+        args = self.manager._set_parent_args(**kwargs)
+        args.pop('as_iterator', None)
+        return args
+
+    async def create(self, data, **kwargs):
+        """Create a new object.
+
+        Returns:
+            object: A newly created `obj_cls` object.
+
+        Raises:
+            NotImplementedError: If objects cannot be created.
+            GitlabCreateError: If the server fails to perform the request.
+        """
+        cls = self.obj_cls
+        if not cls.canCreate:
+            raise NotImplementedError
+        obj = cls(self.agl.gitlab, data,
+                  **self.manager._set_parent_args(**kwargs))
+        return await self.agl.save(obj)
+
+    async def update(self, obj, **kwargs):
+        """Save the changes of an object on the server.
+
+        Returns:
+            object: The updated object.
+
+        Raises:
+            GitlabUpdateError: If the server fails to perform the request.
+        """
+        return await self.agl.save(obj, **kwargs)
+
+    async def delete(self, id, **kwargs):
+        """Delete a GitLab object.
+
+        Returns:
+            bool: True if the operation succeeds.
+
+        Raises:
+            NotImplementedError: If objects cannot be deleted.
+            GitlabDeleteError: If the server fails to perform the request.
+        """
+        cls = self.obj_cls
+        if not cls.canDelete:
+            raise NotImplementedError
+        args = self.manager._set_parent_args(**kwargs)
+        r = await self.agl._run(self.agl.gitlab._delete_request(cls, id,
+                                                                args))
+        raise_error_from_response(r, GitlabDeleteError)
+        return True
+
+
+class AsyncListIterator(object):
+    """Asynchronous iterator over a paginated listing.
+
+    Only the current page is kept in memory, and the ``next`` links are
+    followed as the objects are consumed.
+    """
+
+    def __init__(self, agl, cls, args, fields=None):
+        gl = agl.gitlab
+        self.agl = agl
+        self._cls = cls
+        self._fields = fields
+        self._cls_kwargs = gl._cls_kwargs(args)
+        self._request = gl._list_request(cls, args)
+        self._buffer = collections.deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        gl = self.agl.gitlab
+        while not self._buffer:
+            if self._request is None:
+                raise StopAsyncIteration
+            r = await self.agl._run(self._request)
+            raise_error_from_response(r, GitlabListError)
+            self._buffer.extend(gl._page_objects(r, self._cls,
+                                                 self._cls_kwargs,
+                                                 self._fields))
+            next_url = r.links.get('next', {}).get('url')
+            self._request = None
+            if next_url is not None:
+                self._request = gl._next_page_request(next_url, self._cls)
+        return self._buffer.popleft()
+
+
+class AsyncRetryPolicy(object):
+    """Apply a `gitlab.RetryPolicy` to the asynchronous requests.
+
+    The delays are waited with `asyncio.sleep`.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+
+    async def __call__(self, request, send):
+        policy = self.policy
+        attempt = 0
+        while True:
+            try:
+                r = await send(request)
+            except GitlabConnectionError:
+                if not policy.is_retryable(request.method, attempt):
+                    raise
+                await asyncio.sleep(policy.get_backoff(attempt))
+                attempt += 1
+                continue
+
+            if not policy.is_retryable(request.method, attempt,
+                                       r.status_code):
+                return r
+            await asyncio.sleep(policy.get_backoff(attempt, r))
+            attempt += 1
+
+
+class AsyncRateLimiter(object):
+    """Apply a `gitlab.RateLimiter` to the asynchronous requests.
+
+    The limiter can be shared with synchronous clients. The waits are done
+    with `asyncio.sleep`.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def __call__(self, request, send):
+        wait = self.limiter.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return await send(request)
+
+
+class _StaleConnection(Exception):
+    """A reused connection was closed by the server before answering."""
+
+
+class _Transport(object):
+    """HTTP/1.1 client sending the requests over asyncio streams.
+
+    The connections are kept alive and reused, and at most `max_connections`
+    requests are sent at the same time.
+    """
+
+    def __init__(self, gl, max_connections):
+        self.gitlab = gl
+        self.max_connections = max_connections
+        self._idle = collections.defaultdict(list)
+        self._semaphore = None
+        self._ssl_context = None
+
+    async def send(self, request):
+        gl = self.gitlab
+        try:
+            prepared = self._prepare(request)
+        except Exception as e:
+            raise GitlabConnectionError(
+                "Can't connect to GitLab server (%s)" % e)
+
+        if self._semaphore is None:
+            # Created here to be bound to the running loop
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        connect_timeout, read_timeout = self._timeouts(gl.timeout)
+        async with self._semaphore:
+            try:
+                return await self._send(prepared, connect_timeout,
+                                        read_timeout)
+            except asyncio.CancelledError:
+                raise
+            except GitlabConnectionError:
+                raise
+            except Exception as e:
+                raise GitlabConnectionError(
+                    "Can't connect to GitLab server (%s)" % e)
+
+    def _prepare(self, request):
+        gl = self.gitlab
+        headers = requests.utils.default_headers()
+        # Only these encodings are decoded by `_decode`
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        headers.update(request.headers)
+        auth = None
+        if gl.http_username is not None:
+            auth = requests.auth.HTTPBasicAuth(gl.http_username,
+                                               gl.http_password)
+        prepared = requests.Request(request.method, request.url,
+                                    params=request.params,
+                                    data=request.data, headers=headers,
+                                    auth=auth).prepare()
+        body = prepared.body
+        if hasattr(body, 'read'):
+            body = body.read()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        prepared.body = body
+        if body is not None:
+            prepared.headers['Content-Length'] = str(len(body))
+        return prepared
+
+    @staticmethod
+    def _timeouts(timeout):
+        if isinstance(timeout, tuple):
+            return timeout
+        return timeout, timeout
+
+    async def _send(self, prepared, connect_timeout, read_timeout):
+        url = urllib.parse.urlsplit(prepared.url)
+        https = url.scheme == 'https'
+        port = url.port or (443 if https else 80)
+        key = (url.scheme, url.hostname, port)
+
+        while True:
+            connection, reused = self._get_idle(key)
+            if connection is None:
+                connection = await asyncio.wait_for(
+                    self._connect(url.hostname, port, https),
+                    connect_timeout)
+            try:
+                r, keep_alive = await asyncio.wait_for(
+                    self._exchange(connection, prepared, url, reused),
+                    read_timeout)
+            except _StaleConnection:
+                connection[1].close()
+                continue
+            except BaseException:
+                connection[1].close()
+                raise
+            if keep_alive:
+                self._idle[key].append(connection)
+            else:
+                connection[1].close()
+            return r
+
+    def _get_idle(self, key):
+        idle = self._idle[key]
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        return None, False
+
+    async def _connect(self, host, port, https):
+        context = None
+        if https:
+            context = self._get_ssl_context()
+        return await asyncio.open_connection(
+            host, port, ssl=context, server_hostname=host if https else None)
+
+    def _get_ssl_context(self):
+        if self._ssl_context is None:
+            verify = self.gitlab.ssl_verify
+            if verify is False:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            elif isinstance(verify, str) and os.path.isdir(verify):
+                context = ssl.create_default_context(capath=verify)
+            elif isinstance(verify, str):
+                context = ssl.create_default_context(cafile=verify)
+            else:
+                context = ssl.create_default_context()
+            self._ssl_context = context
+        return self._ssl_context
+
+    async def _exchange(self, connection, prepared, url, reused):
+        reader, writer = connection
+        host = url.hostname
+        if ':' in host:
+            host = '[%s]' % host
+        if url.port is not None:
+            host = '%s:%d' % (host, url.port)
+        target = url.path or '/'
+        if url.query:
+            target = '%s?%s' % (target, url.query)
+
+        lines = ['%s %s HTTP/1.1' % (prepared.method, target),
+                 'Host: %s' % host]
+        lines.extend('%s: %s' % (k, v) for k, v in prepared.headers.items()
+                     if k.lower() != 'host')
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        writer.write(head + (prepared.body or b''))
+        await writer.drain()
+
+        while True:
+            status_line = await reader.readline()
+            if not status_line and reused:
+                raise _StaleConnection()
+            version, status, reason = self._parse_status(status_line)
+            headers = await self._read_headers(reader)
+            # Skip the interim responses (100 Continue...)
+            if not 100 <= status < 200:
+                break
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('Connection', '').lower() != 'close')
+        if (prepared.method == 'HEAD' or status in (204, 304)):
+            body = b''
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            body = await self._read_chunked(reader)
+        elif 'Content-Length' in headers:
+            body = await reader.readexactly(int(headers['Content-Length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        r = requests.Response()
+        r.status_code = status
+        r.reason = reason
+        r.headers = headers
+        r._content = self._decode(body, headers.get('Content-Encoding'))
+        r._content_consumed = True
+        r.url = prepared.url
+        r.encoding = requests.utils.get_encoding_from_headers(headers)
+        r.request = prepared
+        return r, keep_alive
+
+    @staticmethod
+    def _parse_status(status_line):
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ValueError("Invalid status line: %r" % status_line)
+        return parts[0], int(parts[1]), parts[2] if len(parts) > 2 else ''
+
+    @staticmethod
+    async def _read_headers(reader):
+        headers = requests.structures.CaseInsensitiveDict()
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip()
+            value = value.strip()
+            if name in headers:
+                value = '%s, %s' % (headers[name], value)
+            headers[name] = value
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip the trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    @staticmethod
+    def _decode(body, encoding):
+        encoding = (encoding or '').strip().lower()
+        if not body:
+            return body
+        if encoding == 'gzip':
+            return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if encoding == 'deflate':
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                return zlib.decompress(body, -zlib.MAX_WBITS)
+        return body
+
+    async def close(self):
+        connections = [c for idle in self._idle.values() for c in idle]
+        self._idle.clear()
+        for reader, writer in connections:
+            writer.close()
+        for reader, writer in connections:
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Caches for the GitLab API responses."""
+
+from __future__ import absolute_import
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+import six
+from six.moves import urllib
+
+from gitlab import transport
+from gitlab.transport import Middleware
+
+
+class ETagCache(Middleware):
+    """Conditional requests cache for the GET requests.
+
+    The responses providing an ``ETag`` header are stored. The next identical
+    requests are sent with an ``If-None-Match`` header, and the stored
+    response is returned if the server answers with ``304 Not Modified``.
+    The objects are then built from the stored body.
+
+    Args:
+        max_entries (int): Maximum number of responses to keep. The least
+            recently used responses are dropped first.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, request, send):
+        if request.method != 'GET' or request.stream:
+            return send(request)
+
+        key = request.key()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+        if entry is not None:
+            request.headers['If-None-Match'] = entry[0]
+
+        r = send(request)
+        if r.status_code == 304 and entry is not None:
+            return entry[1]
+
+        etag = r.headers.get('ETag')
+        if r.status_code == 200 and etag:
+            # Load the body before storing the response
+            r.content
+            with self._lock:
+                self._entries.pop(key, None)
+                self._entries[key] = (etag, r)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return r
+
+    def clear(self):
+        """Remove all the stored responses."""
+        with self._lock:
+            self._entries.clear()
+
+
+class ObjectCache(object):
+    """In-memory identity map for the GitLab objects.
+
+    The objects retrieved with ``get()`` are stored, keyed on their class,
+    the values of their URL attributes (``project_id``...) and their ID. The
+    same instance is returned by the next calls, until it gets older than
+    `max_age` seconds. Saving or deleting an object removes it from the
+    cache.
+
+    Args:
+        max_entries (int): Maximum number of objects to keep. The least
+            recently used objects are dropped first.
+        max_age (float): Number of seconds an object can be reused. Objects
+            never expire if None.
+    """
+
+    def __init__(self, max_entries=1000, max_age=60):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(cls, id, attrs):
+        """Return the cache key of an object.
+
+        Args:
+            cls: The `GitlabObject` class.
+            id: The object ID.
+            attrs (dict): The values of the URL attributes.
+
+        Returns:
+            tuple: The key, or None if the object cannot be cached.
+        """
+        if not isinstance(id, six.integer_types + six.string_types):
+            return None
+        try:
+            url_attrs = tuple(str(attrs[a]) for a in cls.requiredUrlAttrs)
+        except KeyError:
+            return None
+        return (cls, url_attrs, str(id))
+
+    def get(self, key):
+        """Return a cached object, or None if it is missing or stale."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            if (self.max_age is not None and
+                    transport._clock() - entry[0] > self.max_age):
+                return None
+            self._entries[key] = entry
+            return entry[1]
+
+    def put(self, key, obj):
+        """Store an object."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (transport._clock(), obj)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cls, id, attrs):
+        """Remove an object from the cache.
+
+        Args:
+            cls: The `GitlabObject` class.
+            id: The object ID.
+            attrs (dict): The values of the URL attributes.
+        """
+        key = self.key(cls, id, attrs)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all the objects."""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(Middleware):
+    """Persistent cache for the GET responses, stored in a sqlite database.
+
+    The entries are keyed on the method, the URL, the query parameters
+    (including ``sudo``) and the private token. Several processes can share
+    the same database file.
+
+    The lifetime of an entry depends on the class of the requested objects:
+    the `ttls` dict is looked up first (by class or class name), then the
+    `cacheTTL` attribute of the class, then `default_ttl`. A TTL of 0
+    disables the caching for a class. The responses that are not built into
+    objects (archives, raw files...) are not cached.
+
+    The bodies are compressed with zlib. When the total size of the bodies
+    exceeds `max_size`, the least recently used entries are removed.
+
+    Successful ``POST``, ``PUT`` and ``DELETE`` requests remove the entries
+    of the modified resources.
+
+    The database errors (locked or read-only file...) are not raised: the
+    requests are sent to the server as if the cache was empty.
+
+    Args:
+        path (str): Path to the database file.
+        default_ttl (int): Lifetime of the entries, in seconds.
+        max_size (int): Maximum size of the stored bodies, in bytes.
+        ttls (dict): Lifetimes overriding the class defaults.
+    """
+
+    def __init__(self, path, default_ttl=300, max_size=50 * 1024 * 1024,
+                 ttls=None):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.ttls = ttls or {}
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, url TEXT, expires REAL, '
+                         'accessed REAL, size INTEGER, status INTEGER, '
+                         'headers TEXT, body BLOB)')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed '
+                         'ON responses (accessed)')
+
+    def _connect(self):
+        # A new connection is used for each operation, so that the cache can
+        # be shared by threads and processes. sqlite handles the locking.
+        conn = sqlite3.connect(self.path, timeout=30)
+        return _Connection(conn)
+
+    def get_ttl(self, obj_cls):
+        """Return the lifetime of the entries for a class of objects.
+
+        Args:
+            obj_cls: The `GitlabObject` class, or None.
+
+        Returns:
+            float: The lifetime in seconds.
+        """
+        if obj_cls is None:
+            return self.default_ttl
+        for key in (obj_cls, obj_cls.__name__):
+            if key in self.ttls:
+                return self.ttls[key]
+        if obj_cls.cacheTTL is not None:
+            return obj_cls.cacheTTL
+        return self.default_ttl
+
+    def __call__(self, request, send):
+        if request.method != 'GET':
+            r = send(request)
+            if r.status_code < 400:
+                self._invalidate(request)
+            return r
+
+        if request.stream or request.obj_cls is None:
+            return send(request)
+        ttl = self.get_ttl(request.obj_cls)
+        if not ttl:
+            return send(request)
+
+        key = self._key(request)
+        r = self._load(key)
+        if r is not None:
+            return r
+
+        r = send(request)
+        if r.status_code == 200:
+            self._store(key, request, r, ttl)
+        return r
+
+    def clear(self):
+        """Remove all the stored responses."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
+
+    @staticmethod
+    def _key(request):
+        data = json.dumps(request.key())
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _base_url(url):
+        return urllib.parse.urlsplit(url)._replace(query='').geturl()
+
+    def _load(self, key):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT url, status, headers, body '
+                                   'FROM responses '
+                                   'WHERE key = ? AND expires > ?',
+                                   (key, now)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE responses SET accessed = ? '
+                             'WHERE key = ?', (now, key))
+        except sqlite3.Error:
+            return None
+
+        r = requests.Response()
+        r.url, r.status_code = row[0], row[1]
+        r.headers = CaseInsensitiveDict(json.loads(row[2]))
+        r._content = zlib.decompress(row[3])
+        return r
+
+    def _store(self, key, request, response, ttl):
+        body = zlib.compress(response.content)
+        if len(body) > self.max_size:
+            return
+        try:
+            self._insert(key, request, response, ttl, body)
+        except sqlite3.Error:
+            pass
+
+    def _insert(self, key, request, response, ttl, body):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO responses '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (key, self._base_url(request.url), now + ttl, now,
+                          len(body), response.status_code,
+                          json.dumps(dict(response.headers)),
+                          sqlite3.Binary(body)))
+            conn.execute('DELETE FROM responses WHERE expires <= ?', (now,))
+            size = conn.execute('SELECT SUM(size) FROM responses').fetchone()
+            excess = (size[0] or 0) - self.max_size
+            rows = conn.execute('SELECT key, size FROM responses '
+                                'ORDER BY accessed') if excess > 0 else []
+            evicted = []
+            for old_key, old_size in rows:
+                if excess <= 0:
+                    break
+                evicted.append((old_key,))
+                excess -= old_size
+            conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def _invalidate(self, request):
+        # Remove the collection of the modified object, and everything below
+        # it (the object itself and its sub-resources).
+        url = self._base_url(request.url).rstrip('/')
+        if request.method != 'POST':
+            url = url.rsplit('/', 1)[0]
+        pattern = url.replace('\\', '\\\\').replace('%', '\\%')
+        pattern = pattern.replace('_', '\\_')
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM responses WHERE url = ? "
+                             "OR url LIKE ? ESCAPE '\\'",
+                             (url, pattern + '/%'))
+        except sqlite3.Error:
+            pass
+
+
+class _Connection(object):
+    """Context manager committing and closing a sqlite connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
@@ -150,7 +150,7 @@ class GitlabCLI(object):
         o = self.do_get(cls, gl, what, args)
         try:
             for k, v in args.items():
-                o.__dict__[k] = v
+                setattr(o, k, v)
             o.save()
         except Exception as e:
             _die("Impossible to update object (%s)" % str(e))
@@ -58,26 +58,31 @@ class GitlabConfigParser(object):
             raise GitlabDataError("Impossible to get gitlab informations from "
                                   "configuration (%s)" % self.gitlab_id)
 
-        self.ssl_verify = True
-        try:
-            self.ssl_verify = self._config.getboolean('global', 'ssl_verify')
-        except Exception:
-            pass
-        try:
-            self.ssl_verify = self._config.getboolean(self.gitlab_id,
-                                                      'ssl_verify')
-        except Exception:
-            pass
-
-        self.timeout = 60
-        try:
-            self.timeout = self._config.getint('global', 'timeout')
-        except Exception:
-            pass
-        try:
-            self.timeout = self._config.getint(self.gitlab_id, 'timeout')
-        except Exception:
-            pass
+        self.ssl_verify = self._get_option('ssl_verify', True,
+                                           self._config.getboolean)
+        self.timeout = self._get_option('timeout', 60, self._config.getint)
+        self.pagination_workers = self._get_option('pagination_workers', 1,
+                                                   self._config.getint)
+        self.pool_connections = self._get_option('pool_connections', 10,
+                                                 self._config.getint)
+        self.pool_maxsize = self._get_option('pool_maxsize', 10,
+                                             self._config.getint)
+        self.pool_block = self._get_option('pool_block', False,
+                                           self._config.getboolean)
+        self.max_retries = self._get_option('max_retries', 0,
+                                            self._config.getint)
+        self.rate_limit = self._get_option('rate_limit', None,
+                                           self._config.getfloat)
+        self.rate_limit_burst = self._get_option('rate_limit_burst', None,
+                                                 self._config.getint)
+        self.bulk_workers = self._get_option('bulk_workers', 1,
+                                             self._config.getint)
+        self.cache_path = self._get_option('cache_path', None,
+                                           self._config.get)
+        if self.cache_path:
+            self.cache_path = os.path.expanduser(self.cache_path)
+        self.cache_ttl = self._get_option('cache_ttl', 300,
+                                          self._config.getint)
 
         self.http_username = None
         self.http_password = None
@@ -88,3 +93,16 @@ class GitlabConfigParser(object):
                                                   'http_password')
         except Exception:
             pass
+
+    def _get_option(self, option, default, getter):
+        """Return an option value from the server or the global section.
+
+        The server section overrides the global section.
+        """
+        value = default
+        for section in ('global', self.gitlab_id):
+            try:
+                value = getter(section, option)
+            except Exception:
+                pass
+        return value
@@ -22,7 +22,10 @@ import base64
 import copy
 import itertools
 import json
+from multiprocessing.pool import ThreadPool
+import re
 import sys
+import threading
 import warnings
 
 import six
@@ -40,6 +43,131 @@ class jsonEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+def _stream_response(response, action, chunk_size=1024):
+    """Write the content of a streamed response chunk by chunk.
+
+    Args:
+        response: The requests response object, created with stream=True.
+        action: A file path, a file-like object, or a callable receiving
+            each chunk of data.
+        chunk_size (int): Size of the chunks to read.
+
+    Returns:
+        int: The number of bytes downloaded.
+    """
+    if isinstance(action, six.string_types):
+        with open(action, 'wb') as f:
+            return _stream_response(response, f, chunk_size)
+    if hasattr(action, 'write'):
+        action = action.write
+
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                action(chunk)
+                size += len(chunk)
+    finally:
+        response.close()
+    return size
+
+
+def _iter_response(response, chunk_size=1024):
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+def _response_content(response, streamed, action, chunk_size):
+    if not streamed:
+        return response.content
+    if action is None:
+        return _iter_response(response, chunk_size)
+    return _stream_response(response, action, chunk_size)
+
+
+def _map_workers(func, items, workers):
+    """Call `func` on each item using `workers` threads.
+
+    The results are returned in order. A `GitlabError` raised for an item is
+    returned in place of its result.
+    """
+    def call(item):
+        try:
+            return func(item)
+        except GitlabError as e:
+            return e
+
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+
+
+class _ManagerDescriptor(object):
+    """Create the manager of a GitLab object on first access.
+
+    The manager is then stored in the object ``__dict__``, which takes
+    precedence over this descriptor.
+    """
+
+    def __init__(self, name, manager_cls, args):
+        self.name = name
+        self.manager_cls = manager_cls
+        self.args = args
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        manager = self.manager_cls(obj.gitlab, obj, self.args)
+        obj.__dict__[self.name] = manager
+        return manager
+
+
+class _ListIndex(object):
+    """ID => object index, filled as the pages of a listing are read.
+
+    The pages are requested one at a time, and only until the searched
+    objects are found. Only the request of the next page is kept between two
+    lookups, so an index doesn't hold any connection or thread.
+    """
+
+    def __init__(self, gl, cls, args):
+        if not cls.canList or not cls._url:
+            raise NotImplementedError
+        self._gl = gl
+        self._cls = cls
+        self._cls_kwargs = gl._cls_kwargs(args)
+        self._request = gl._list_request(cls, args)
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def find(self, id):
+        id = str(id)
+        with self._lock:
+            while id not in self._objects and self._request is not None:
+                self._read_page()
+            return self._objects.get(id)
+
+    def _read_page(self):
+        gl = self._gl
+        r = gl._run(self._request)
+        raise_error_from_response(r, GitlabListError)
+        for obj in gl._page_objects(r, self._cls, self._cls_kwargs):
+            self._objects[str(getattr(obj, obj.idAttr))] = obj
+        next_url = r.links.get('next', {}).get('url')
+        self._request = None
+        if next_url is not None:
+            self._request = gl._next_page_request(next_url, self._cls)
+
+
 class BaseManager(object):
     """Base manager class for API operations.
 
@@ -81,11 +209,17 @@ class BaseManager(object):
 
         return args
 
-    def get(self, id=None, **kwargs):
+    def get(self, id=None, lazy=False, **kwargs):
         """Get a GitLab object.
 
         Args:
             id: ID of the object to retrieve.
+            lazy (bool): If True, return an object without requesting the
+                server. Its managers can be used right away, and its
+                attributes are retrieved on first access, which raises a
+                `GitlabGetError` if the object doesn't exist (``hasattr()``
+                included). Ignored for the objects that can only be found in
+                a listing.
             **kwargs: Additional arguments to send to GitLab.
 
         Returns:
@@ -98,16 +232,112 @@ class BaseManager(object):
         args = self._set_parent_args(**kwargs)
         if not self.obj_cls.canGet:
             raise NotImplementedError
-        return self.obj_cls.get(self.gitlab, id, **args)
+        if self.obj_cls.canGet == 'from_list':
+            obj = self._get_from_index([id], args)[0]
+            if obj is None:
+                raise GitlabGetError("Object not found")
+            return obj
+        return self.obj_cls.get(self.gitlab, id, lazy=lazy, **args)
+
+    def _get_from_index(self, ids, args):
+        """Find objects of a 'from_list' class in an ID => object index.
+
+        The index is built on first use, stored in the Gitlab object, and
+        reused until it is cleared, dropped or too old. A reused index is
+        rebuilt once if some IDs are missing, since the objects might have
+        been created in the meantime.
+
+        Returns:
+            list: The objects, or None for the missing IDs.
+        """
+        gl = self.gitlab
+        key = gl._list_index_key(self.obj_cls, args)
+        index = gl._get_list_index(key)
+        if index is not None:
+            results = [index.find(id) for id in ids]
+            if None not in results:
+                return results
+
+        index = _ListIndex(gl, self.obj_cls, args)
+        gl._put_list_index(key, index)
+        return [index.find(id) for id in ids]
+
+    def clear_index(self):
+        """Clear the indexes used to get the objects from their listing.
+
+        All the indexes of `obj_cls` objects are cleared. The indexes of a
+        parent object are cleared automatically when one of its objects is
+        created, saved or deleted.
+        """
+        self.gitlab._clear_list_indexes(self.obj_cls)
+
+    def get_many(self, ids, workers=None, on_missing='raise', **kwargs):
+        """Get several GitLab objects.
+
+        The objects are requested concurrently. For the classes that can only
+        be retrieved from a listing, the listing is requested once.
+
+        Args:
+            ids (list): IDs of the objects to retrieve.
+            workers (int): Number of concurrent requests. Defaults to the
+                `bulk_workers` value of the Gitlab connection.
+            on_missing (str): What to do with the objects that don't exist:
+                ``'raise'`` raises a `GitlabGetError`, ``'skip'`` ignores
+                them, and ``'collect'`` returns their IDs.
+            **kwargs: Additional arguments to send to GitLab.
+
+        Returns:
+            list[object]: The `obj_cls` objects, in the order of `ids`. With
+                ``on_missing='collect'``, a ``(objects, missing_ids)`` tuple.
+
+        Raises:
+            NotImplementedError: If objects cannot be retrieved.
+            GitlabGetError: If the server fails to perform the request.
+        """
+        if on_missing not in ('raise', 'skip', 'collect'):
+            raise ValueError("Invalid on_missing value: %s" % on_missing)
+        if not self.obj_cls.canGet:
+            raise NotImplementedError
+
+        ids = list(ids)
+        if self.obj_cls.canGet == 'from_list':
+            results = self._get_from_index(ids,
+                                           self._set_parent_args(**kwargs))
+        else:
+            results = _map_workers(lambda id: self.get(id, **kwargs), ids,
+                                   self._workers(workers))
+
+        objects = []
+        missing = []
+        for id, result in zip(ids, results):
+            if result is None:
+                result = GitlabGetError("Object not found: %s" % id, 404)
+            if isinstance(result, GitlabError):
+                if (on_missing == 'raise' or
+                        getattr(result, 'response_code', None) != 404):
+                    raise result
+                missing.append(id)
+            else:
+                objects.append(result)
+
+        if on_missing == 'collect':
+            return objects, missing
+        return objects
 
     def list(self, **kwargs):
         """Get a list of GitLab objects.
 
         Args:
+            all (bool): If True, return all the items, without pagination.
+            as_iterator (bool): If True, return a generator yielding the
+                objects as the pages are retrieved from the server.
+            fields (list[str]): If defined, return light namedtuple records
+                holding only these fields.
             **kwargs: Additional arguments to send to GitLab.
 
         Returns:
-            list[object]: A list of `obj_cls` objects.
+            list[object]: A list of `obj_cls` objects, or a generator if
+                `as_iterator` is True.
 
         Raises:
             NotImplementedError: If objects cannot be listed.
@@ -155,7 +385,148 @@ class BaseManager(object):
             raise NotImplementedError
         self.gitlab.delete(self.obj_cls, id, **args)
 
+    def _workers(self, workers):
+        return self.gitlab.bulk_workers if workers is None else workers
+
+    def create_many(self, data_list, workers=None, **kwargs):
+        """Create several objects of class `obj_cls`.
+
+        The requests are sent concurrently, and a failure does not stop the
+        creation of the other objects.
+
+        Args:
+            data_list (list[dict]): The parameters of each object.
+            workers (int): Number of concurrent requests. Defaults to the
+                `bulk_workers` value of the Gitlab connection.
+            **kwargs: Additional arguments to send to GitLab.
+
+        Returns:
+            list: For each item of `data_list`, in order, the new object or
+                the `GitlabError` raised when creating it.
+
+        Raises:
+            NotImplementedError: If objects cannot be created.
+        """
+        if not self.obj_cls.canCreate:
+            raise NotImplementedError
+        return _map_workers(lambda data: self.create(data, **kwargs),
+                            data_list, self._workers(workers))
+
+    def delete_many(self, ids, workers=None, **kwargs):
+        """Delete several GitLab objects.
+
+        The requests are sent concurrently, and a failure does not stop the
+        deletion of the other objects.
+
+        Args:
+            ids (list): IDs of the objects to delete.
+            workers (int): Number of concurrent requests. Defaults to the
+                `bulk_workers` value of the Gitlab connection.
+            **kwargs: Additional arguments to send to GitLab.
+
+        Returns:
+            list: For each ID, in order, True or the `GitlabError` raised
+                when deleting the object.
+
+        Raises:
+            NotImplementedError: If objects cannot be deleted.
+        """
+        if not self.obj_cls.canDelete:
+            raise NotImplementedError
+
+        def delete(id):
+            self.delete(id, **kwargs)
+            return True
+
+        return _map_workers(delete, ids, self._workers(workers))
+
+    def save_many(self, objects, workers=None, **kwargs):
+        """Create or update several objects on the server.
+
+        The requests are sent concurrently, and a failure does not stop the
+        saving of the other objects.
+
+        Args:
+            objects (list): The `obj_cls` objects to save.
+            workers (int): Number of concurrent requests. Defaults to the
+                `bulk_workers` value of the Gitlab connection.
+            **kwargs: Additional arguments to send to GitLab.
+
+        Returns:
+            list: For each object, in order, the saved object or the
+                `GitlabError` raised when saving it.
+        """
+        def save(obj):
+            obj.save(**kwargs)
+            return obj
+
+        return _map_workers(save, objects, self._workers(workers))
 
+
+_URL_KEY_RE = re.compile(r'%\((\w+)\)s')
+
+# Parameters sent with the create and update requests when defined
+_EXTRA_DATA_ATTRS = ('sudo', 'page', 'per_page')
+
+# Server value of the attributes that were not defined
+_MISSING = object()
+
+
+def _copy_value(value):
+    # Shallow copy of the mutable values, to detect in-place modifications
+    if isinstance(value, (list, dict)):
+        return copy.copy(value)
+    return value
+
+
+# Internal state of the GitlabObject instances, not displayed
+_STATE_ATTRS = frozenset(['_lazy_attrs', '_original', '_etag', '_pending_get'])
+
+
+class _GitlabObjectMeta(type):
+    """Metaclass computing the class-level metadata of the GitLab objects.
+
+    The attribute lists, the URL placeholders and the managers are processed
+    once when the class is defined, instead of on each request.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(_GitlabObjectMeta, cls).__init__(name, bases, attrs)
+
+        create_attrs = tuple(itertools.chain(cls.requiredCreateAttrs,
+                                             cls.optionalCreateAttrs))
+        if cls.requiredUpdateAttrs or cls.optionalUpdateAttrs:
+            update_attrs = tuple(itertools.chain(cls.requiredUpdateAttrs,
+                                                 cls.optionalUpdateAttrs))
+            update_required = tuple(cls.requiredUpdateAttrs)
+        else:
+            update_attrs = create_attrs
+            update_required = tuple(cls.requiredCreateAttrs)
+        cls._create_data_attrs = create_attrs + _EXTRA_DATA_ATTRS
+        cls._update_data_attrs = update_attrs + _EXTRA_DATA_ATTRS
+        cls._update_attrs = update_attrs
+        cls._update_required_data_attrs = update_required
+
+        url_attrs = tuple(cls.requiredUrlAttrs)
+        cls._list_required = url_attrs + tuple(cls.requiredListAttrs)
+        cls._get_required = url_attrs + tuple(cls.requiredGetAttrs)
+        cls._create_required = url_attrs + tuple(cls.requiredCreateAttrs)
+        cls._update_required = url_attrs + update_required
+        cls._delete_required = url_attrs + tuple(cls.requiredDeleteAttrs)
+
+        cls._url_keys = frozenset(
+            itertools.chain(_URL_KEY_RE.findall(cls._url or ''),
+                            _URL_KEY_RE.findall(cls._urlPlural or '')))
+
+        # Resolved on first use, the classes might not be defined yet
+        cls._constructor_classes = {}
+
+        cls._manager_names = frozenset(var for var, _, _ in cls.managers)
+        for var, manager_cls, args in cls.managers:
+            setattr(cls, var, _ManagerDescriptor(var, manager_cls, args))
+
+
+@six.add_metaclass(_GitlabObjectMeta)
 class GitlabObject(object):
     """Base class for all classes that interface with GitLab."""
     #: Url to use in GitLab for this object
@@ -207,22 +578,32 @@ class GitlabObject(object):
     idAttr = 'id'
     #: Attribute to use as ID when displaying the object.
     shortPrintAttr = None
+    #: Number of seconds the responses can be kept by a persistent cache.
+    #: The cache default is used if None.
+    cacheTTL = None
 
     def _data_for_gitlab(self, extra_parameters={}, update=False):
         data = {}
-        if update and (self.requiredUpdateAttrs or self.optionalUpdateAttrs):
-            attributes = itertools.chain(self.requiredUpdateAttrs,
-                                         self.optionalUpdateAttrs)
+        values = self.__dict__
+        if update and values.get('_from_api'):
+            # Only send the required and the modified attributes
+            attributes = (self._update_required_data_attrs +
+                          tuple(self._changed_attrs()) + _EXTRA_DATA_ATTRS)
+        elif update:
+            attributes = self._update_data_attrs
         else:
-            attributes = itertools.chain(self.requiredCreateAttrs,
-                                         self.optionalCreateAttrs)
-        attributes = list(attributes) + ['sudo', 'page', 'per_page']
+            attributes = self._create_data_attrs
+        lazy_attrs = values.get('_lazy_attrs', ())
         for attribute in attributes:
-            if hasattr(self, attribute):
+            if attribute in values:
+                value = values[attribute]
+            elif attribute in lazy_attrs:
                 value = getattr(self, attribute)
-                if isinstance(value, list):
-                    value = ",".join(value)
-                data[attribute] = value
+            else:
+                continue
+            if isinstance(value, list):
+                value = ",".join(value)
+            data[attribute] = value
 
         data.update(extra_parameters)
 
@@ -236,9 +617,14 @@ class GitlabObject(object):
             gl (gitlab.Gitlab): Gitlab object referencing the GitLab server.
             per_page (int): Maximum number of items to return.
             page (int): ID of the page to return when using pagination.
+            as_iterator (bool): If True, return a generator yielding the
+                objects as the pages are retrieved from the server.
+            fields (list[str]): If defined, return light namedtuple records
+                holding only these fields.
 
         Returns:
-            list[object]: A list of objects.
+            list[object]: A list of objects, or a generator if `as_iterator`
+                is True.
 
         Raises:
             NotImplementedError: If objects can't be listed.
@@ -253,15 +639,18 @@ class GitlabObject(object):
         return gl.list(cls, **kwargs)
 
     @classmethod
-    def get(cls, gl, id, **kwargs):
+    def get(cls, gl, id, lazy=False, **kwargs):
         """Retrieve a single object.
 
         Args:
             gl (gitlab.Gitlab): Gitlab object referencing the GitLab server.
             id (int or str): ID of the object to retrieve.
+            lazy (bool): If True, return an object without requesting the
+                server. Its attributes are retrieved on first access.
 
         Returns:
-            object: The found GitLab object.
+            object: The found GitLab object. If `gl` has an object cache, the
+                cached instance is returned when it is fresh enough.
 
         Raises:
             NotImplementedError: If objects can't be retrieved.
@@ -271,15 +660,58 @@ class GitlabObject(object):
         if cls.canGet is False:
             raise NotImplementedError
         elif cls.canGet is True:
-            return cls(gl, id, **kwargs)
+            if lazy and id is not None:
+                return cls._lazy_get(gl, id, **kwargs)
+            cache = getattr(gl, 'object_cache', None)
+            key = None
+            # Requests with extra parameters (sudo...) are not cached
+            if cache is not None and set(kwargs) <= set(cls.requiredUrlAttrs):
+                key = cache.key(cls, id, kwargs)
+            obj = cache.get(key) if key is not None else None
+            if obj is None:
+                obj = cls(gl, id, **kwargs)
+                if key is not None:
+                    cache.put(key, obj)
+            return obj
         elif cls.canGet == 'from_list':
-            for obj in cls.list(gl, **kwargs):
+            # Walk the pages lazily and stop as soon as the object is found
+            for obj in cls.list(gl, as_iterator=True, **kwargs):
                 obj_id = getattr(obj, obj.idAttr)
                 if str(obj_id) == str(id):
                     return obj
 
             raise GitlabGetError("Object not found")
 
+    @classmethod
+    def _lazy_get(cls, gl, id, **kwargs):
+        obj = cls(gl, {cls.idAttr: id}, **kwargs)
+        obj._from_api = True
+        if cls.idAttr != 'id':
+            # Retrieved with the other attributes
+            del obj.__dict__['id']
+        obj._pending_get = (id, kwargs)
+        return obj
+
+    def _fetch_pending(self):
+        """Retrieve the attributes of an object returned by a lazy get."""
+        pending = self.__dict__.pop('_pending_get', None)
+        if pending is None:
+            return
+        id, kwargs = pending
+        try:
+            data = self._get_data(id, kwargs)
+        except Exception:
+            self._pending_get = pending
+            raise
+        self._set_pending_data(data)
+
+    def _set_pending_data(self, data):
+        # Keep the attributes modified since the object was returned
+        self._set_from_dict(dict(
+            (k, v) for k, v in data.items()
+            if k not in self.__dict__ and k not in self._manager_names))
+        self._snapshot(data, nested=True)
+
     @classmethod
     def _get_list_or_object(cls, gl, id, **kwargs):
         if id is None and cls.getListWhenNoId:
@@ -289,37 +721,233 @@ class GitlabObject(object):
 
     def _get_object(self, k, v):
         if self._constructorTypes and k in self._constructorTypes:
-            return globals()[self._constructorTypes[k]](self.gitlab, v)
+            cls = self._constructor_classes.get(k)
+            if cls is None:
+                cls = globals()[self._constructorTypes[k]]
+                self._constructor_classes[k] = cls
+            return cls(self.gitlab, v)
         else:
             return v
 
     def _set_from_dict(self, data):
-        for k, v in data.items():
-            if isinstance(v, list):
-                self.__dict__[k] = []
-                for i in v:
-                    self.__dict__[k].append(self._get_object(k, i))
-            elif v is None:
-                self.__dict__[k] = None
+        values = self.__dict__
+        if '_lazy_attrs' in values:
+            for k in data:
+                self._pop_lazy(k)
+        values.update(data)
+
+        # The nested objects are built on first access
+        deferred = [k for k in self._constructorTypes or ()
+                    if values.get(k) is not None and k in data]
+        if deferred:
+            lazy_attrs = values.setdefault('_lazy_attrs', {})
+            for k in deferred:
+                lazy_attrs[k] = values.pop(k)
+        self._snapshot(data, nested=True)
+
+    def _pop_lazy(self, name):
+        # The dict only exists while some values are deferred
+        lazy_attrs = self.__dict__.get('_lazy_attrs', {})
+        value = lazy_attrs.pop(name, None)
+        if '_lazy_attrs' in self.__dict__ and not lazy_attrs:
+            del self.__dict__['_lazy_attrs']
+        return value
+
+    def _materialize(self, name):
+        value = self._pop_lazy(name)
+        if isinstance(value, list):
+            value = [self._get_object(name, i) for i in value]
+        else:
+            value = self._get_object(name, value)
+        self.__dict__[name] = value
+        return value
+
+    def _materialize_all(self):
+        self._fetch_pending()
+        for name in list(self.__dict__.get('_lazy_attrs', ())):
+            if name in self.__dict__:
+                self._pop_lazy(name)
             else:
-                self.__dict__[k] = self._get_object(k, v)
+                self._materialize(name)
+
+    def __getattr__(self, name):
+        if name in self.__dict__.get('_lazy_attrs', ()):
+            return self._materialize(name)
+        if '_pending_get' in self.__dict__ and not name.startswith('_'):
+            self._fetch_pending()
+            return getattr(self, name)
+        raise AttributeError("'%s' object has no attribute '%s'" %
+                             (type(self).__name__, name))
+
+    def __delattr__(self, name):
+        lazy = name in self.__dict__.get('_lazy_attrs', ())
+        self._pop_lazy(name)
+        if name in self.__dict__ or not lazy:
+            object.__delattr__(self, name)
+
+    def _snapshot(self, data, nested=False):
+        """Remember the server values of the attributes that can be updated.
+
+        The lists and dicts are copied, so that the values modified in place
+        are detected too. If `nested` is True, `data` holds the raw server
+        values, and the values of the nested objects are remembered as well
+        (without copy), so that `refresh()` can compare them.
+        """
+        original = self.__dict__.get('_original')
+        for name in self._update_attrs:
+            if name in data:
+                if original is None:
+                    original = self.__dict__['_original'] = {}
+                original[name] = _copy_value(data[name])
+        if not nested:
+            return
+        for name in self._constructorTypes or ():
+            if name in data and name not in self._update_attrs:
+                if original is None:
+                    original = self.__dict__['_original'] = {}
+                original[name] = data[name]
+
+    def _changed_attrs(self):
+        """Return the attributes modified since the object was retrieved."""
+        values = self.__dict__
+        original = values.get('_original', {})
+        return [name for name in self._update_attrs
+                if name in values and
+                values[name] != original.get(name, _MISSING)]
+
+    def _revert_changes(self):
+        """Restore the server values of the modified attributes.
+
+        Returns:
+            list: The names of the restored attributes.
+        """
+        values = self.__dict__
+        original = values.get('_original', {})
+        changed = self._changed_attrs()
+        for name in changed:
+            value = original.get(name, _MISSING)
+            if value is _MISSING:
+                del values[name]
+            else:
+                values[name] = _copy_value(value)
+        return changed
+
+    def _get_data(self, id, kwargs):
+        """Request the attributes of the object, and remember its ETag."""
+        r = self.gitlab._get_response(type(self), id, kwargs)
+        return self._data_from_response(r)
+
+    def _data_from_response(self, r):
+        raise_error_from_response(r, GitlabGetError)
+        self._set_etag(r)
+        return r.json()
+
+    def _set_etag(self, r):
+        etag = r.headers.get('ETag')
+        if etag:
+            self.__dict__['_etag'] = etag
+
+    @classmethod
+    def _from_response(cls, gl, r, **kwargs):
+        """Build an object from the response of a get request."""
+        raise_error_from_response(r, GitlabGetError)
+        obj = cls(gl, r.json(), _from_api=True, **kwargs)
+        obj._set_etag(r)
+        return obj
 
     def _create(self, **kwargs):
         if not self.canCreate:
             raise NotImplementedError
 
-        json = self.gitlab.create(self, **kwargs)
+        self._set_created(self.gitlab.create(self, **kwargs))
+
+    def _set_created(self, json):
+        # The values sent are the server values, unless the server changed
+        # them in its answer
+        self._snapshot(self.__dict__)
         self._set_from_dict(json)
         self._from_api = True
 
     def _update(self, **kwargs):
+        if not self._prepare_update(kwargs):
+            return
+        self._set_updated(self.gitlab.update(self, **kwargs))
+
+    def _prepare_update(self, kwargs):
+        """Check that the object can be updated.
+
+        Returns:
+            bool: False if there is nothing to update.
+        """
         if not self.canUpdate:
             raise NotImplementedError
+        return bool(kwargs or self._changed_attrs())
 
-        json = self.gitlab.update(self, **kwargs)
+    def _set_updated(self, json):
+        self._snapshot(self.__dict__)
         self._set_from_dict(json)
 
+    def refresh(self, **kwargs):
+        """Reload the attributes of the object from the server.
+
+        The request is conditional: if the object has not changed since it
+        was retrieved, the server answers with ``304 Not Modified`` and the
+        attributes are not downloaded again. Only the attributes whose value
+        changed are updated, and the unsaved modifications of the attributes
+        sent by `save()` are discarded.
+
+        Args:
+            **kwargs: Additional arguments to send to GitLab.
+
+        Returns:
+            bool: True if attributes have been updated.
+
+        Raises:
+            NotImplementedError: If objects can't be retrieved.
+            GitlabGetError: If the server cannot perform the request.
+        """
+        if self.canGet is not True:
+            raise NotImplementedError
+
+        values = self.__dict__
+        params = dict((k, values[k]) for k in self._get_required
+                      if k in values)
+        params.update(kwargs)
+        id = getattr(self, self.idAttr) if self.getRequiresId else None
+        headers = {}
+        if values.get('_etag'):
+            headers['If-None-Match'] = values['_etag']
+
+        r = self.gitlab._get_response(type(self), id, params, headers)
+        raise_error_from_response(r, GitlabGetError, [200, 304])
+        values.pop('_pending_get', None)
+        reverted = self._revert_changes()
+        if r.status_code == 304:
+            return bool(reverted)
+        values['_etag'] = r.headers.get('ETag')
+
+        lazy_attrs = values.get('_lazy_attrs', {})
+        changed = {}
+        data = r.json()
+        for k, v in data.items():
+            if k in self._manager_names:
+                continue
+            if k in lazy_attrs:
+                current = lazy_attrs[k]
+            elif self._constructorTypes and k in self._constructorTypes:
+                # Materialized nested objects are compared with the values
+                # they were built from
+                current = values.get('_original', {}).get(k, _MISSING)
+            else:
+                current = values.get(k, _MISSING)
+            if current != v:
+                changed[k] = v
+        self._set_from_dict(changed)
+        self._snapshot(data, nested=True)
+        return bool(changed or reverted)
+
     def save(self, **kwargs):
+        self._fetch_pending()
         if self._from_api:
             self._update(**kwargs)
         else:
@@ -378,7 +1006,7 @@ class GitlabObject(object):
            isinstance(data, six.string_types)):
             if not self.canGet:
                 raise NotImplementedError
-            data = self.gitlab.get(self.__class__, data, **kwargs)
+            data = self._get_data(data, kwargs)
             self._from_api = True
 
         self._set_from_dict(data)
@@ -395,12 +1023,18 @@ class GitlabObject(object):
         self._set_managers()
 
     def _set_managers(self):
-        for var, cls, attrs in self.managers:
-            manager = cls(self.gitlab, self, attrs)
-            setattr(self, var, manager)
+        # The managers are created on first access by the descriptors
+        # installed on the class. Data attributes named after a manager are
+        # hidden by the manager.
+        for var, manager_cls, attrs in self.managers:
+            self.__dict__.pop(var, None)
+            self._pop_lazy(var)
 
     def __str__(self):
-        return '%s => %s' % (type(self), str(self.__dict__))
+        self._materialize_all()
+        values = dict((k, v) for k, v in six.iteritems(self.__dict__)
+                      if k not in _STATE_ATTRS)
+        return '%s => %s' % (type(self), str(values))
 
     def display(self, pretty):
         if pretty:
@@ -414,6 +1048,7 @@ class GitlabObject(object):
         Args:
             depth (int): Used internaly for recursive call.
         """
+        self._fetch_pending()
         id = self.__dict__[self.idAttr]
         print("%s%s: %s" % (" " * depth * 2, self.idAttr, id))
         if self.shortPrintAttr:
@@ -446,6 +1081,7 @@ class GitlabObject(object):
         Args:
             depth (int): Used internaly for recursive call.
         """
+        self._materialize_all()
         id = self.__dict__[self.idAttr]
         print("%s%s: %s" % (" " * depth * 2, self.idAttr, id))
         for k in sorted(self.__dict__.keys()):
@@ -482,6 +1118,7 @@ class GitlabObject(object):
 
     def as_dict(self):
         """Dump the object as a dict."""
+        self._materialize_all()
         return {k: v for k, v in six.iteritems(self.__dict__)
                 if (not isinstance(v, BaseManager) and not k[0] == '_')}
 
@@ -524,7 +1161,8 @@ class User(GitlabObject):
     def _data_for_gitlab(self, extra_parameters={}, update=False):
         if hasattr(self, 'confirm'):
             self.confirm = str(self.confirm).lower()
-        return super(User, self)._data_for_gitlab(extra_parameters)
+        return super(User, self)._data_for_gitlab(extra_parameters,
+                                                  update=update)
 
     def Key(self, id=None, **kwargs):
         warnings.warn("`Key` is deprecated, use `keys` instead",
@@ -619,6 +1257,7 @@ class CurrentUser(GitlabObject):
     canUpdate = False
     canDelete = False
     shortPrintAttr = 'username'
+    getRequiresId = False
     managers = [('keys', CurrentUserKeyManager, [('user_id', 'id')])]
 
     def Key(self, id=None, **kwargs):
@@ -643,6 +1282,7 @@ class ApplicationSettings(GitlabObject):
     canList = False
     canCreate = False
     canDelete = False
+    getRequiresId = False
 
 
 class ApplicationSettingsManager(BaseManager):
@@ -657,9 +1297,9 @@ class GroupMember(GitlabObject):
     requiredUpdateAttrs = ['access_level']
     shortPrintAttr = 'username'
 
-    def _update(self, **kwargs):
+    def _prepare_update(self, kwargs):
         self.user_id = self.id
-        super(GroupMember, self)._update(**kwargs)
+        return super(GroupMember, self)._prepare_update(kwargs)
 
 
 class GroupMemberManager(BaseManager):
@@ -757,6 +1397,7 @@ class License(GitlabObject):
     canUpdate = False
     canCreate = False
     idAttr = 'key'
+    cacheTTL = 6 * 3600
 
     optionalListAttrs = ['popular']
     optionalGetAttrs = ['project', 'fullname']
@@ -805,6 +1446,7 @@ class ProjectBuild(GitlabObject):
     canDelete = False
     canUpdate = False
     canCreate = False
+    cacheTTL = 5
 
     def cancel(self):
         """Cancel the build."""
@@ -840,14 +1482,24 @@ class ProjectCommit(GitlabObject):
 
         return r.json()
 
-    def blob(self, filepath, **kwargs):
+    def blob(self, filepath, streamed=False, action=None, chunk_size=1024,
+             **kwargs):
         """Generate the content of a file for this commit.
 
         Args:
             filepath (str): Path of the file to request.
+            streamed (bool): If True the data will be processed by chunks of
+                `chunk_size` and each chunk is passed to `action` for
+                treatment.
+            action: A file path, a file-like object, or a callable receiving
+                each chunk of data. If None, an iterator over the chunks is
+                returned.
+            chunk_size (int): Size of each chunk.
 
         Returns:
-            str: The content of the file
+            str: The content of the file.
+                If `streamed` is True, the number of bytes downloaded, or an
+                iterator over the chunks if `action` is None.
 
         Raises:
             GitlabConnectionError: If the server cannot be reached.
@@ -856,10 +1508,9 @@ class ProjectCommit(GitlabObject):
         url = ('/projects/%(project_id)s/repository/blobs/%(commit_id)s' %
                {'project_id': self.project_id, 'commit_id': self.id})
         url += '?filepath=%s' % filepath
-        r = self.gitlab._raw_get(url, **kwargs)
+        r = self.gitlab._raw_get(url, streamed=streamed, **kwargs)
         raise_error_from_response(r, GitlabGetError)
-
-        return r.content
+        return _response_content(r, streamed, action, chunk_size)
 
     def builds(self, **kwargs):
         """List the build for this commit.
@@ -988,7 +1639,8 @@ class ProjectIssue(GitlabObject):
                 labels = ", ".join(self.labels)
                 extra_parameters['labels'] = labels
 
-        return super(ProjectIssue, self)._data_for_gitlab(extra_parameters)
+        return super(ProjectIssue, self)._data_for_gitlab(extra_parameters,
+                                                          update=update)
 
     def Note(self, id=None, **kwargs):
         warnings.warn("`Note` is deprecated, use `notes` instead",
@@ -1141,7 +1793,7 @@ class ProjectMergeRequest(GitlabObject):
 
     def _data_for_gitlab(self, extra_parameters={}, update=False):
         data = (super(ProjectMergeRequest, self)
-                ._data_for_gitlab(extra_parameters))
+                ._data_for_gitlab(extra_parameters, update=update))
         if update:
             # Drop source_branch attribute as it is not accepted by the gitlab
             # server (Issue #76)
@@ -1314,12 +1966,33 @@ class ProjectSnippet(GitlabObject):
     managers = [('notes', ProjectSnippetNoteManager,
                  [('project_id', 'project_id'), ('snippet_id', 'id')])]
 
-    def Content(self, **kwargs):
+    def Content(self, streamed=False, action=None, chunk_size=1024,
+                **kwargs):
+        """Return the raw content of a snippet.
+
+        Args:
+            streamed (bool): If True the data will be processed by chunks of
+                `chunk_size` and each chunk is passed to `action` for
+                treatment.
+            action: A file path, a file-like object, or a callable receiving
+                each chunk of data. If None, an iterator over the chunks is
+                returned.
+            chunk_size (int): Size of each chunk.
+
+        Returns:
+            str: The snippet content.
+                If `streamed` is True, the number of bytes downloaded, or an
+                iterator over the chunks if `action` is None.
+
+        Raises:
+            GitlabConnectionError: If the server cannot be reached.
+            GitlabGetError: If the server fails to perform the request.
+        """
         url = ("/projects/%(project_id)s/snippets/%(snippet_id)s/raw" %
                {'project_id': self.project_id, 'snippet_id': self.id})
-        r = self.gitlab._raw_get(url, **kwargs)
+        r = self.gitlab._raw_get(url, streamed=streamed, **kwargs)
         raise_error_from_response(r, GitlabGetError)
-        return r.content
+        return _response_content(r, streamed, action, chunk_size)
 
     def Note(self, id=None, **kwargs):
         warnings.warn("`Note` is deprecated, use `notes` instead",
@@ -1530,15 +2203,25 @@ class Project(GitlabObject):
                       DeprecationWarning)
         return self.repository_blob(sha, filepath, **kwargs)
 
-    def repository_blob(self, sha, filepath, **kwargs):
+    def repository_blob(self, sha, filepath, streamed=False, action=None,
+                        chunk_size=1024, **kwargs):
         """Return the content of a file for a commit.
 
         Args:
             sha (str): ID of the commit
             filepath (str): Path of the file to return
+            streamed (bool): If True the data will be processed by chunks of
+                `chunk_size` and each chunk is passed to `action` for
+                treatment.
+            action: A file path, a file-like object, or a callable receiving
+                each chunk of data. If None, an iterator over the chunks is
+                returned.
+            chunk_size (int): Size of each chunk.
 
         Returns:
-            str: The file content
+            str: The file content.
+                If `streamed` is True, the number of bytes downloaded, or an
+                iterator over the chunks if `action` is None.
 
         Raises:
             GitlabConnectionError: If the server cannot be reached.
@@ -1546,27 +2229,37 @@ class Project(GitlabObject):
         """
         url = "/projects/%s/repository/blobs/%s" % (self.id, sha)
         url += '?filepath=%s' % (filepath)
-        r = self.gitlab._raw_get(url, **kwargs)
+        r = self.gitlab._raw_get(url, streamed=streamed, **kwargs)
         raise_error_from_response(r, GitlabGetError)
-        return r.content
+        return _response_content(r, streamed, action, chunk_size)
 
-    def repository_raw_blob(self, sha, **kwargs):
+    def repository_raw_blob(self, sha, streamed=False, action=None,
+                            chunk_size=1024, **kwargs):
         """Returns the raw file contents for a blob by blob SHA.
 
         Args:
             sha(str): ID of the blob
+            streamed (bool): If True the data will be processed by chunks of
+                `chunk_size` and each chunk is passed to `action` for
+                treatment.
+            action: A file path, a file-like object, or a callable receiving
+                each chunk of data. If None, an iterator over the chunks is
+                returned.
+            chunk_size (int): Size of each chunk.
 
         Returns:
-            str: The blob content
+            str: The blob content.
+                If `streamed` is True, the number of bytes downloaded, or an
+                iterator over the chunks if `action` is None.
 
         Raises:
             GitlabConnectionError: If the server cannot be reached.
             GitlabGetError: If the server fails to perform the request.
         """
         url = "/projects/%s/repository/raw_blobs/%s" % (self.id, sha)
-        r = self.gitlab._raw_get(url, **kwargs)
+        r = self.gitlab._raw_get(url, streamed=streamed, **kwargs)
         raise_error_from_response(r, GitlabGetError)
-        return r.content
+        return _response_content(r, streamed, action, chunk_size)
 
     def repository_compare(self, from_, to, **kwargs):
         """Returns a diff between two branches/commits.
@@ -1607,16 +2300,26 @@ class Project(GitlabObject):
         warnings.warn("`archive` is deprecated, "
                       "use `repository_archive` instead",
                       DeprecationWarning)
-        return self.repository_archive(path, ref_name, **kwargs)
+        return self.repository_archive(sha, **kwargs)
 
-    def repository_archive(self, sha=None, **kwargs):
+    def repository_archive(self, sha=None, streamed=False, action=None,
+                           chunk_size=1024, **kwargs):
         """Return a tarball of the repository.
 
         Args:
             sha (str): ID of the commit (default branch by default).
+            streamed (bool): If True the data will be processed by chunks of
+                `chunk_size` and each chunk is passed to `action` for
+                treatment, so the archive is never fully loaded in memory.
+            action: A file path, a file-like object, or a callable receiving
+                each chunk of data. If None, an iterator over the chunks is
+                returned.
+            chunk_size (int): Size of each chunk.
 
         Returns:
-            str: The binary data of the archive.
+            str: The binary data of the archive. If `streamed` is True, the
+                number of bytes downloaded, or an iterator over the chunks if
+                `action` is None.
 
         Raises:
             GitlabConnectionError: If the server cannot be reached.
@@ -1625,9 +2328,9 @@ class Project(GitlabObject):
         url = '/projects/%s/repository/archive' % self.id
         if sha:
             url += '?sha=%s' % sha
-        r = self.gitlab._raw_get(url, **kwargs)
+        r = self.gitlab._raw_get(url, streamed=streamed, **kwargs)
         raise_error_from_response(r, GitlabGetError)
-        return r.content
+        return _response_content(r, streamed, action, chunk_size)
 
     def create_file(self, path, branch, content, message, **kwargs):
         """Creates file in project repository
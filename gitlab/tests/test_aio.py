@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import json
+import re
+import threading
+import time
+try:
+    import unittest
+except ImportError:
+    import unittest2 as unittest
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves import urllib
+
+from gitlab import *  # noqa
+
+try:
+    import asyncio
+    from gitlab import aio
+except (ImportError, SyntaxError):
+    asyncio = None
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        url = urllib.parse.urlparse(self.path)
+        path = re.sub('/+', '/', url.path).rstrip('/')
+        query = dict(urllib.parse.parse_qsl(url.query))
+        with server.lock:
+            server.requests.append((self.command, path, query,
+                                    self.headers, body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight,
+                                       server.in_flight)
+        try:
+            time.sleep(server.delay)
+            status, headers, content = server.respond(
+                self.command, path, query, body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        content = content.encode('utf-8')
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+        chunked = headers.pop('chunked', False)
+        if self.headers.get('Accept-Encoding', '').startswith('gzip'):
+            content = gzip.compress(content)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v.replace('{url}', server.url))
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(content), 10):
+                chunk = content[i:i + 10]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, respond):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.respond = respond
+        self.delay = 0
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.url = 'http://127.0.0.1:%d' % self.server_address[1]
+
+
+def _respond(method, path, query, body):
+    if path == '/api/v3/projects/1' and method == 'GET':
+        return 200, {'ETag': 'W/"1"'}, '{"name": "name", "id": 1}'
+    if path == '/api/v3/projects/2':
+        return 404, None, '{"message": "404 Not found"}'
+    if path == '/api/v3/projects/1/issues' and method == 'GET':
+        base = '<{url}/api/v3/projects/1/issues?page=%s>'
+        page = int(query.get('page', 1))
+        headers = {'X-Total-Pages': '3', 'chunked': page == 2}
+        if page < 3:
+            headers['Link'] = (base % (page + 1)) + '; rel="next"'
+        items = [{"id": page * 10 + i, "title": "t"} for i in range(2)]
+        return 200, headers, json.dumps(items)
+    if path == '/api/v3/projects/1/issues' and method == 'POST':
+        data = json.loads(body.decode('utf-8'))
+        data['id'] = 5
+        return 201, None, json.dumps(data)
+    if path == '/api/v3/projects/1/issues/5' and method == 'PUT':
+        data = json.loads(body.decode('utf-8'))
+        data.update({'id': 5, 'updated': True})
+        return 200, None, json.dumps(data)
+    if path == '/api/v3/projects/1/issues/5' and method == 'DELETE':
+        return 200, None, '{}'
+    return 404, None, '{"message": "404 Not found"}'
+
+
+@unittest.skipIf(asyncio is None or six.PY2, "asyncio is not available")
+class TestAsyncGitlab(unittest.TestCase):
+    def setUp(self):
+        self.server = _Server(_respond)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+        self.gl = Gitlab(self.server.url, private_token="private_token",
+                         timeout=5)
+        self.loop = asyncio.new_event_loop()
+        self.agl = aio.AsyncGitlab(self.gl, max_connections=4)
+
+    def tearDown(self):
+        self.wait(self.agl.close())
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_managers(self):
+        self.assertIsInstance(self.agl.projects, aio.AsyncManager)
+        self.assertIs(self.agl.projects.manager, self.gl.projects)
+        self.assertRaises(AttributeError, getattr, self.agl, 'set_url')
+
+    def test_get(self):
+        project = self.wait(self.agl.projects.get(1))
+        self.assertIsInstance(project, Project)
+        self.assertEqual(project.name, "name")
+        self.assertEqual(project._etag, 'W/"1"')
+        self.assertTrue(project._from_api)
+        method, path, query, headers, body = self.server.requests[0]
+        self.assertEqual(headers['PRIVATE-TOKEN'], 'private_token')
+
+    def test_get_error(self):
+        self.assertRaises(GitlabGetError, self.wait, self.agl.projects.get(2))
+
+    def test_connection_error(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertRaises(GitlabConnectionError, self.wait,
+                          self.agl.projects.get(1))
+
+    def test_keep_alive(self):
+        for i in range(3):
+            self.wait(self.agl.projects.get(1))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_gather_concurrent(self):
+        self.server.delay = 0.2
+        start = time.time()
+
+        async def gather():
+            return await asyncio.gather(
+                *[self.agl.projects.get(1) for i in range(8)])
+
+        projects = self.wait(gather())
+        elapsed = time.time() - start
+        self.assertEqual([p.id for p in projects], [1] * 8)
+        # 8 requests, 4 at a time, without any thread on the client side
+        self.assertEqual(self.server.max_in_flight, 4)
+        self.assertLess(elapsed, 1.2)
+
+    def test_list_all(self):
+        project = Project(self.gl, {"id": 1})
+        issues = self.wait(self.agl.manager(project.issues).list(all=True))
+        self.assertEqual([i.id for i in issues], [10, 11, 20, 21, 30, 31])
+        self.assertIsInstance(issues[0], ProjectIssue)
+        self.assertEqual(issues[0].project_id, 1)
+
+    def test_list_one_page(self):
+        project = Project(self.gl, {"id": 1})
+        issues = self.wait(self.agl.manager(project.issues).list())
+        self.assertEqual([i.id for i in issues], [10, 11])
+
+    def test_iter(self):
+        project = Project(self.gl, {"id": 1})
+        iterator = self.agl.manager(project.issues).iter(fields=['id'])
+        self.assertIs(iterator.__aiter__(), iterator)
+
+        ids = []
+        while True:
+            try:
+                issue = self.wait(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+            ids.append(issue.id)
+        self.assertEqual(ids, [10, 11, 20, 21, 30, 31])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_create_update_delete(self):
+        manager = self.agl.manager(Project(self.gl, {"id": 1}).issues)
+        issue = self.wait(manager.create({'title': 'new'}))
+        self.assertEqual(issue.id, 5)
+        self.assertTrue(issue._from_api)
+
+        issue.title = 'changed'
+        self.wait(self.agl.save(issue))
+        self.assertTrue(issue.updated)
+        requests = len(self.server.requests)
+        # Nothing changed, no request
+        self.wait(manager.update(issue))
+        self.assertEqual(len(self.server.requests), requests)
+
+        self.assertTrue(self.wait(self.agl.delete(issue)))
+        method, path, query, headers, body = self.server.requests[-1]
+        self.assertEqual((method, path),
+                         ('DELETE', '/api/v3/projects/1/issues/5'))
+        self.assertTrue(self.wait(manager.delete(5)))
+
+    def test_retry_policy(self):
+        calls = []
+
+        def respond(method, path, query, body):
+            calls.append(path)
+            if len(calls) == 1:
+                return 503, None, '{}'
+            return _respond(method, path, query, body)
+
+        self.server.respond = respond
+        gl = Gitlab(self.server.url, private_token="private_token",
+                    retry=RetryPolicy(backoff_factor=0))
+        agl = aio.AsyncGitlab(gl)
+        self.assertIsInstance(agl.middlewares[0], aio.AsyncRetryPolicy)
+        project = self.wait(agl.projects.get(1))
+        self.wait(agl.close())
+        self.assertEqual(project.id, 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_middlewares(self):
+        urls = []
+
+        async def record(request, send):
+            urls.append(request.url)
+            return await send(request)
+
+        agl = aio.AsyncGitlab(self.gl, middlewares=[record])
+        self.wait(agl.projects.get(1))
+        self.wait(agl.close())
+        self.assertEqual(urls, ['%s/api/v3/projects/1' % self.server.url])
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import time
+try:
+    import unittest
+except ImportError:
+    import unittest2 as unittest
+
+from httmock import HTTMock  # noqa
+from httmock import response  # noqa
+from httmock import urlmatch  # noqa
+import mock
+
+from gitlab import *  # noqa
+from gitlab import transport
+from gitlab.objects import *  # noqa
+
+
+class TestETagCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ETagCache(max_entries=2)
+        self.gl = Gitlab("http://localhost", private_token="private_token",
+                         cache=self.cache)
+        self.requests = []
+
+    def _resp(self, etag='"abc"'):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/\d+")
+        def resp_cont(url, request):
+            self.requests.append(request)
+            if request.headers.get('If-None-Match') == etag:
+                return response(304, '', {}, None, 5, request)
+            headers = {'content-type': 'application/json', 'ETag': etag}
+            content = '{"name": "testproject", "id": 1}'.encode("utf-8")
+            return response(200, content, headers, None, 5, request)
+
+        return resp_cont
+
+    def test_not_modified(self):
+        with HTTMock(self._resp()):
+            project = self.gl.projects.get(1)
+            self.assertNotIn('If-None-Match', self.requests[0].headers)
+            project2 = self.gl.projects.get(1)
+        self.assertEqual(self.requests[1].headers['If-None-Match'], '"abc"')
+        self.assertEqual(project, project2)
+        self.assertIsNot(project, project2)
+
+    def test_modified(self):
+        with HTTMock(self._resp('"abc"')):
+            self.gl.projects.get(1)
+        with HTTMock(self._resp('"def"')):
+            self.gl.projects.get(1)
+            self.gl.projects.get(1)
+        self.assertEqual(self.requests[1].headers['If-None-Match'], '"abc"')
+        self.assertEqual(self.requests[2].headers['If-None-Match'], '"def"')
+
+    def test_eviction(self):
+        with HTTMock(self._resp()):
+            for i in (1, 2, 3):
+                self.gl.projects.get(i)
+            self.gl.projects.get(1)
+        self.assertNotIn('If-None-Match', self.requests[3].headers)
+        self.assertEqual(len(self.cache._entries), 2)
+
+    def test_no_cache_for_writes(self):
+        with HTTMock(self._resp()):
+            self.gl._raw_put('/projects/1')
+            self.gl._raw_put('/projects/1')
+        self.assertNotIn('If-None-Match', self.requests[1].headers)
+
+
+class TestObjectCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ObjectCache(max_entries=10, max_age=60)
+        self.gl = Gitlab("http://localhost", private_token="private_token",
+                         object_cache=self.cache)
+        self.requests = []
+
+    @property
+    def resp_cont(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/\d+(/issues/\d+)?")
+        def resp_cont(url, request):
+            self.requests.append(request)
+            headers = {'content-type': 'application/json'}
+            content = '{"name": "testproject", "id": 1, "title": "t"}'
+            return response(200, content.encode("utf-8"), headers, None, 5,
+                            request)
+
+        return resp_cont
+
+    def test_identity(self):
+        with HTTMock(self.resp_cont):
+            project = self.gl.projects.get(1)
+            self.assertIs(self.gl.projects.get('1'), project)
+            self.assertIsNot(self.gl.projects.get(1, sudo='user'), project)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_url_attrs(self):
+        with HTTMock(self.resp_cont):
+            issue = self.gl.project_issues.get(1, project_id=1)
+            self.assertIs(self.gl.project_issues.get(1, project_id=1), issue)
+            self.assertIsNot(self.gl.project_issues.get(1, project_id=2),
+                             issue)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_max_age(self):
+        with HTTMock(self.resp_cont):
+            project = self.gl.projects.get(1)
+            with mock.patch('gitlab.transport._clock',
+                            return_value=transport._clock() + 61):
+                self.assertIsNot(self.gl.projects.get(1), project)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_max_entries(self):
+        self.cache.max_entries = 1
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            self.gl.projects.get(2)
+            self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_invalidation(self):
+        with HTTMock(self.resp_cont):
+            project = self.gl.projects.get(1)
+            project.name = "new name"
+            project.save()
+            self.assertIsNot(self.gl.projects.get(1), project)
+            project = self.gl.projects.get(1)
+            self.gl.projects.delete(1)
+            self.assertIsNot(self.gl.projects.get(1), project)
+        self.assertEqual(len(self.requests), 5)
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+        self.cache = SQLiteCache(self.path, default_ttl=60)
+        self.gl = Gitlab("http://localhost", private_token="private_token",
+                         cache=self.cache)
+        self.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @property
+    def resp_cont(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/(projects|licenses|users)(/.*)?")
+        def resp_cont(url, request):
+            self.requests.append(request)
+            headers = {'content-type': 'application/json'}
+            if request.method != 'GET':
+                return response(200, '{}', headers, None, 5, request)
+            if url.path.endswith('/projects'):
+                content = '[{"name": "p1", "id": 1}, {"name": "p2", "id": 2}]'
+            else:
+                content = '{"name": "testproject", "id": 1, "key": "mit"}'
+            return response(200, content.encode("utf-8"), headers, None, 5,
+                            request)
+
+        return resp_cont
+
+    def test_get_cached(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            project = self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(project.name, "testproject")
+
+    def test_shared_between_instances(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.list()
+            gl = Gitlab("http://localhost", private_token="private_token",
+                        cache=SQLiteCache(self.path))
+            projects = gl.projects.list()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual([p.id for p in projects], [1, 2])
+
+    def test_key(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            self.gl.projects.get(1, sudo='user')
+            self.gl.set_token('other_token')
+            self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_ttl(self):
+        self.assertEqual(self.cache.get_ttl(License), License.cacheTTL)
+        self.assertEqual(self.cache.get_ttl(Project), 60)
+        self.assertEqual(self.cache.get_ttl(None), 60)
+        self.cache.ttls = {'Project': 0, License: 10}
+        self.assertEqual(self.cache.get_ttl(Project), 0)
+        self.assertEqual(self.cache.get_ttl(License), 10)
+
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_expired(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            with mock.patch('time.time', return_value=time.time() + 61):
+                self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_invalidation(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.list()
+            self.gl.projects.get(1)
+            self.gl.licenses.get('mit')
+            self.gl._raw_put('/projects/2')
+            self.gl.projects.list()
+            self.gl.projects.get(1)
+            self.gl.licenses.get('mit')
+        self.assertEqual(len(self.requests), 6)
+
+    def test_not_cached_without_class(self):
+        with HTTMock(self.resp_cont):
+            self.gl._raw_get('/projects/1')
+            self.gl._raw_get('/projects/1')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_database_errors(self):
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            # The file can't be opened as a database anymore
+            with open(self.path, 'wb') as f:
+                f.write(b'not a database' * 100)
+            project = self.gl.projects.get(1)
+            self.gl._raw_put('/projects/1')
+        self.assertEqual(project.name, "testproject")
+        self.assertEqual(len(self.requests), 3)
+
+    def test_eviction(self):
+        self.cache.max_size = 1
+        with HTTMock(self.resp_cont):
+            self.gl.projects.get(1)
+            self.gl.projects.get(1)
+        self.assertEqual(len(self.requests), 2)
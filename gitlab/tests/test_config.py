@@ -40,6 +40,15 @@ url = https://two.url
 private_token = GHIJKL
 ssl_verify = false
 timeout = 10
+pagination_workers = 4
+pool_maxsize = 32
+pool_block = true
+max_retries = 5
+rate_limit = 2.5
+rate_limit_burst = 10
+cache_path = /tmp/gitlab.sqlite
+cache_ttl = 60
+bulk_workers = 8
 """
 
 no_default_config = u"""[global]
@@ -99,6 +108,15 @@ class TestConfigParser(unittest.TestCase):
         self.assertEqual("ABCDEF", cp.token)
         self.assertEqual(2, cp.timeout)
         self.assertEqual(True, cp.ssl_verify)
+        self.assertEqual(1, cp.pagination_workers)
+        self.assertEqual(10, cp.pool_connections)
+        self.assertEqual(10, cp.pool_maxsize)
+        self.assertEqual(False, cp.pool_block)
+        self.assertEqual(0, cp.max_retries)
+        self.assertEqual(None, cp.rate_limit)
+        self.assertEqual(None, cp.cache_path)
+        self.assertEqual(300, cp.cache_ttl)
+        self.assertEqual(1, cp.bulk_workers)
 
         fd = six.StringIO(valid_config)
         fd.close = mock.Mock(return_value=None)
@@ -109,3 +127,12 @@ class TestConfigParser(unittest.TestCase):
         self.assertEqual("GHIJKL", cp.token)
         self.assertEqual(10, cp.timeout)
         self.assertEqual(False, cp.ssl_verify)
+        self.assertEqual(4, cp.pagination_workers)
+        self.assertEqual(32, cp.pool_maxsize)
+        self.assertEqual(True, cp.pool_block)
+        self.assertEqual(5, cp.max_retries)
+        self.assertEqual(2.5, cp.rate_limit)
+        self.assertEqual(10, cp.rate_limit_burst)
+        self.assertEqual('/tmp/gitlab.sqlite', cp.cache_path)
+        self.assertEqual(60, cp.cache_ttl)
+        self.assertEqual(8, cp.bulk_workers)
@@ -243,6 +243,117 @@ class TestGitlabMethods(unittest.TestCase):
             self.assertEqual(data[0].ref, "b")
             self.assertEqual(len(data), 2)
 
+    def test_list_as_iterator(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path='/api/v3/projects/1/repository/branches', method="get")
+        def resp_one(url, request):
+            headers = {
+                'content-type': 'application/json',
+                'link': '<http://localhost/api/v3/projects/1/repository/branc'
+                'hes?page=2&per_page=1>; rel="next"'
+            }
+            content = ('[{"branch_name": "otherbranch", '
+                       '"project_id": 1, "ref": "b"}]').encode("utf-8")
+            return response(200, content, headers, None, 5, request)
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path='/api/v3/projects/1/repository/branches', method="get",
+                  query=r'.*page=2.*')
+        def resp_two(url, request):
+            headers = {'content-type': 'application/json'}
+            content = ('[{"branch_name": "testbranch", '
+                       '"project_id": 1, "ref": "a"}]').encode("utf-8")
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_one):
+            data = self.gl.list(ProjectBranch, project_id=1, per_page=1,
+                                as_iterator=True)
+            self.assertNotIsInstance(data, list)
+            self.assertEqual(next(data).branch_name, "otherbranch")
+
+        with HTTMock(resp_two, resp_one):
+            data = self.gl.list(ProjectBranch, project_id=1, per_page=1,
+                                as_iterator=True)
+            self.assertEqual([b.branch_name for b in data],
+                             ["otherbranch", "testbranch"])
+
+    def test_list_fields(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path='/api/v3/projects/1/repository/branches', method="get")
+        def resp_cont(url, request):
+            headers = {'content-type': 'application/json'}
+            content = ('[{"name": "master", "protected": true, '
+                       '"commit": {"id": "abcdef"}}, '
+                       '{"name": "dev", "protected": false}]')
+            return response(200, content.encode("utf-8"), headers, None, 5,
+                            request)
+
+        with HTTMock(resp_cont):
+            rows = self.gl.project_branches.list(
+                project_id=1, fields=['name', 'commit'])
+            data = self.gl.list(ProjectBranch, project_id=1, as_iterator=True,
+                                fields=['name', 'protected'])
+            self.assertEqual([tuple(r) for r in data],
+                             [("master", True), ("dev", False)])
+            rows2 = ProjectBranch.list(self.gl, project_id=1,
+                                       fields=['name', 'commit'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0].name, "master")
+        self.assertEqual(rows[0].commit, {"id": "abcdef"})
+        self.assertIsNone(rows[1].commit)
+        self.assertEqual(type(rows[0]).__name__, "ProjectBranchRow")
+        self.assertIs(type(rows2[0]), type(rows[0]))
+
+    def test_list_prefetch_pages(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path='/api/v3/projects/1/repository/branches', method="get")
+        def resp_page(url, request):
+            page = 1
+            if 'page=' in url.query:
+                page = int(url.query.split('page=')[1].split('&')[0])
+            headers = {'content-type': 'application/json',
+                       'X-Total-Pages': '4'}
+            if page < 4:
+                headers['link'] = ('<http://localhost/api/v3/projects/1/'
+                                   'repository/branches?page=%d&per_page=1>; '
+                                   'rel="next"' % (page + 1))
+            content = ('[{"branch_name": "branch%d", "project_id": 1}]' %
+                       page).encode("utf-8")
+            return response(200, content, headers, None, 5, request)
+
+        self.gl.pagination_workers = 2
+        with HTTMock(resp_page):
+            data = self.gl.list(ProjectBranch, project_id=1, per_page=1,
+                                all=True)
+        self.assertEqual([b.branch_name for b in data],
+                         ["branch1", "branch2", "branch3", "branch4"])
+
+    def test_list_prefetch_fallback(self):
+        # The next links are followed when the pages URLs can't be built
+        for param, total_pages in (('cursor', '3'), ('page', 'many')):
+            @urlmatch(scheme="http", netloc="localhost",
+                      path='/api/v3/projects/1/repository/branches',
+                      method="get")
+            def resp_page(url, request):
+                page = 1
+                if '%s=' % param in url.query:
+                    page = int(url.query.split('%s=' % param)[1][0])
+                headers = {'content-type': 'application/json',
+                           'X-Total-Pages': total_pages}
+                if page < 3:
+                    headers['link'] = ('<http://localhost/api/v3/projects/1/'
+                                       'repository/branches?%s=%d>; '
+                                       'rel="next"' % (param, page + 1))
+                content = ('[{"branch_name": "branch%d", "project_id": 1}]' %
+                           page).encode("utf-8")
+                return response(200, content, headers, None, 5, request)
+
+            self.gl.pagination_workers = 2
+            with HTTMock(resp_page):
+                data = self.gl.list(ProjectBranch, project_id=1, all=True)
+            self.assertEqual([b.branch_name for b in data],
+                             ["branch1", "branch2", "branch3"])
+
     def test_list_401(self):
         @urlmatch(scheme="http", netloc="localhost",
                   path="/api/v3/projects/1/repository/branches", method="get")
@@ -543,6 +654,13 @@ class TestGitlab(unittest.TestCase):
                          email="testuser@test.com", password="testpassword",
                          ssl_verify=True)
 
+    def test_connection_pool(self):
+        gl = Gitlab("http://localhost", private_token="private_token",
+                    pool_maxsize=32, pool_block=True)
+        adapter = gl.session.get_adapter("https://localhost")
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter._pool_block, True)
+
     def test_set_url(self):
         self.gl.set_url("http://new_url")
         self.assertEqual(self.gl._url, "http://new_url/api/v3")
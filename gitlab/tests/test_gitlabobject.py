@@ -22,6 +22,9 @@ from __future__ import division
 from __future__ import absolute_import
 
 import json
+import os
+import shutil
+import tempfile
 try:
     import unittest
 except ImportError:
@@ -30,6 +33,7 @@ except ImportError:
 from httmock import HTTMock  # noqa
 from httmock import response  # noqa
 from httmock import urlmatch  # noqa
+import six
 
 from gitlab import *  # noqa
 
@@ -159,6 +163,72 @@ class TestGitlabObject(unittest.TestCase):
         self.assertEqual(data["username"], "testname")
         self.assertEqual(data["gitlab"]["url"], "http://localhost/api/v3")
 
+    def test_lazy_attributes(self):
+        data = {"name": "master",
+                "commit": {"id": "abcdef", "author_name": "me"},
+                "authors": [{"id": 1}, {"id": 2}],
+                "reviewer": None}
+
+        class FakeBranch(ProjectBranch):
+            _constructorTypes = {'commit': 'ProjectCommit',
+                                 'authors': 'User', 'reviewer': 'User'}
+
+        obj = FakeBranch(self.gl, data, project_id=1)
+        self.assertNotIn('commit', obj.__dict__)
+        self.assertIsNone(obj.reviewer)
+        self.assertEqual(obj.name, "master")
+
+        commit = obj.commit
+        self.assertIsInstance(commit, ProjectCommit)
+        self.assertEqual(commit.author_name, "me")
+        self.assertIs(obj.commit, commit)
+        self.assertNotIn('commit', obj._lazy_attrs)
+
+        self.assertEqual([a.id for a in obj.as_dict()['authors']], [1, 2])
+        self.assertIsInstance(obj.authors[0], User)
+        self.assertNotIn('_lazy_attrs', obj.__dict__)
+        self.assertRaises(AttributeError, getattr, obj, 'missing')
+
+        obj._set_from_dict({"commit": {"id": "012345"}})
+        self.assertEqual(obj.commit.id, "012345")
+        del obj.commit
+        self.assertFalse(hasattr(obj, 'commit'))
+
+        obj._set_from_dict({"commit": {"id": "012345"}})
+        obj.commit = None
+        self.assertIsNone(obj.as_dict()['commit'])
+        self.assertNotIn('_lazy_attrs', str(obj))
+
+        obj = ProjectBranch(self.gl, {"name": "master"}, project_id=1)
+        self.assertNotIn('_lazy_attrs', obj.__dict__)
+
+    def test_class_metadata(self):
+        self.assertEqual(ProjectMergeRequest._url_keys,
+                         frozenset(['project_id']))
+        self.assertEqual(ProjectIssueNote._list_required,
+                         ('project_id', 'issue_id'))
+        self.assertEqual(User._update_required, ('email', 'username', 'name'))
+        self.assertEqual(ProjectLabel._update_required,
+                         ('project_id', 'name', 'color'))
+        self.assertIn('sudo', Project._create_data_attrs)
+        self.assertIsInstance(Project.__dict__['issues'],
+                              gitlab.objects._ManagerDescriptor)
+
+        class FakeObj(GitlabObject):
+            _url = '/fake/%(parent_id)s/fake'
+            requiredUrlAttrs = ['parent_id']
+            _constructorTypes = {'owner': 'User'}
+            managers = [('keys', UserKeyManager, [('user_id', 'id')])]
+
+        self.assertEqual(FakeObj._url_keys, frozenset(['parent_id']))
+        self.assertEqual(FakeObj._constructor_classes, {})
+        obj = FakeObj(self.gl, {'id': 1, 'owner': {'id': 2}}, parent_id=1)
+        self.assertIsInstance(obj.owner, User)
+        self.assertEqual(FakeObj._constructor_classes, {'owner': User})
+        self.assertIsInstance(obj.keys, UserKeyManager)
+        url = self.gl._construct_url(None, obj, {'parent_id': 'a/b'})
+        self.assertEqual(url, 'http://localhost/api/v3/fake/a%2Fb/fake')
+
     def test_data_for_gitlab(self):
         class FakeObj1(GitlabObject):
             _url = '/fake1'
@@ -299,6 +369,165 @@ class TestGitlabObject(unittest.TestCase):
             obj.save()
             self.assertEqual(obj.name, "newname")
 
+    def test_save_changed_attrs(self):
+        bodies = []
+
+        @urlmatch(scheme="http", netloc="localhost", path="/api/v3/users/1",
+                  method="put")
+        def resp_update(url, request):
+            bodies.append(json.loads(request.body))
+            headers = {'content-type': 'application/json'}
+            content = '{"id": 1, "name": "newname", "bio": "bio"}'
+            return response(200, content, headers, None, 5, request)
+
+        obj = User(self.gl, data={"name": "testname", "email": "email",
+                                  "id": 1, "username": "username",
+                                  "bio": "bio", "skype": "skype"},
+                   _from_api=True)
+        with HTTMock(resp_update):
+            obj.save()
+            obj.skype = "skype"
+            obj.save()
+            self.assertEqual(bodies, [])
+
+            obj.name = "newname"
+            obj.bio = "changed"
+            obj.bio = "bio"
+            self.assertEqual(obj._changed_attrs(), ["name"])
+            obj.save()
+            self.assertEqual(bodies, [{"name": "newname", "email": "email",
+                                       "username": "username"}])
+            self.assertEqual(obj._changed_attrs(), [])
+
+            obj.save(sudo="admin")
+            self.assertEqual(len(bodies), 2)
+
+    def test_save_modified_in_place(self):
+        bodies = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1/issues/+2", method="put")
+        def resp_update(url, request):
+            bodies.append(json.loads(request.body))
+            headers = {'content-type': 'application/json'}
+            content = '{"id": 2, "title": "title", "labels": ["a", "b"]}'
+            return response(200, content, headers, None, 5, request)
+
+        obj = ProjectIssue(self.gl, data={"id": 2, "title": "title",
+                                          "labels": ["a"]},
+                           project_id=1, _from_api=True)
+        self.assertNotIn('_original', str(obj))
+        with HTTMock(resp_update):
+            obj.labels.append('b')
+            obj.save()
+            self.assertEqual(bodies, [{"title": "title", "labels": "a, b"}])
+            self.assertEqual(obj._changed_attrs(), [])
+
+    def test_refresh(self):
+        state = {'etag': '"1"', 'status': 'running'}
+        requests = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path="/api/v3/projects/1/builds/2", method="get")
+        def resp_get(url, request):
+            requests.append(request)
+            headers = {'content-type': 'application/json',
+                       'ETag': state['etag']}
+            if request.headers.get('If-None-Match') == state['etag']:
+                return response(304, '', headers, None, 5, request)
+            content = json.dumps({"id": 2, "status": state['status'],
+                                  "user": {"id": 3}})
+            return response(200, content, headers, None, 5, request)
+
+        build = ProjectBuild(self.gl, {"id": 2, "status": "pending",
+                                       "user": {"id": 3}},
+                             project_id=1, _from_api=True)
+        user = build.user
+        with HTTMock(resp_get):
+            self.assertTrue(build.refresh())
+            self.assertEqual(build.status, "running")
+            self.assertNotIn('If-None-Match', requests[0].headers)
+
+            self.assertFalse(build.refresh())
+            self.assertEqual(requests[1].headers['If-None-Match'], '"1"')
+
+            state.update(etag='"2"', status='success')
+            build.status = "local"
+            self.assertTrue(build.refresh())
+            self.assertEqual(build.status, "success")
+            self.assertEqual(build.user.id, 3)
+            # The user didn't change, it is not rebuilt
+            self.assertIs(build.user, user)
+            self.assertEqual(build._changed_attrs(), [])
+
+    def test_refresh_nested_objects(self):
+        state = {'etag': '"1"', 'author': {"id": 3, "username": "user"}}
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1/merge_request/+2",
+                  method="get")
+        def resp_get(url, request):
+            headers = {'content-type': 'application/json',
+                       'ETag': state['etag']}
+            content = json.dumps({"id": 2, "title": "mr",
+                                  "author": state['author']})
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            mr = self.gl.project_mergerequests.get(2, project_id=1)
+            author = mr.author
+            state['etag'] = '"2"'
+            self.assertFalse(mr.refresh())
+            self.assertIs(mr.author, author)
+
+            state['author'] = {"id": 4, "username": "other"}
+            self.assertTrue(mr.refresh())
+            self.assertEqual(mr.author.username, "other")
+            self.assertFalse(mr.refresh())
+
+    def test_refresh_discards_changes(self):
+        requests = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1/issues/+2", method="get")
+        def resp_get(url, request):
+            requests.append(request)
+            headers = {'content-type': 'application/json', 'ETag': '"1"'}
+            if request.headers.get('If-None-Match') == '"1"':
+                return response(304, '', headers, None, 5, request)
+            content = '{"id": 2, "title": "title", "labels": ["a"]}'
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            obj = self.gl.project_issues.get(2, project_id=1)
+            self.assertFalse(obj.refresh())
+            self.assertEqual(requests[1].headers['If-None-Match'], '"1"')
+
+            obj.title = "local"
+            obj.labels.append("b")
+            obj.description = "new"
+            self.assertTrue(obj.refresh())
+        self.assertEqual(obj.title, "title")
+        self.assertEqual(obj.labels, ["a"])
+        self.assertFalse(hasattr(obj, 'description'))
+        self.assertEqual(obj._changed_attrs(), [])
+
+    def test_refresh_without_id(self):
+        @urlmatch(scheme="http", netloc="localhost", path="/api/v3/user",
+                  method="get")
+        def resp_get(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"id": 1, "username": "user"}'
+            return response(200, content, headers, None, 5, request)
+
+        obj = CurrentUser(self.gl, {"id": 1, "username": "old"})
+        with HTTMock(resp_get):
+            self.assertTrue(obj.refresh())
+        self.assertEqual(obj.username, "user")
+
+        obj = ProjectLabel(self.gl, {"name": "label"}, project_id=1)
+        self.assertRaises(NotImplementedError, obj.refresh)
+
     def test_save_without_id(self):
         obj = Project(self.gl, data={"name": "testname"})
         with HTTMock(resp_create_project):
@@ -455,6 +684,11 @@ class TestProjectCommit(unittest.TestCase):
             blob = self.obj.blob("testing")
             self.assertEqual(blob, b'blob')
 
+    def test_blob_streamed(self):
+        with HTTMock(self.resp_blob):
+            chunks = self.obj.blob("testing", streamed=True, chunk_size=2)
+            self.assertEqual(list(chunks), [b'bl', b'ob'])
+
     def test_blob_fail(self):
         with HTTMock(self.resp_blob_fail):
             self.assertRaises(GitlabGetError, self.obj.blob, "testing")
@@ -489,6 +723,74 @@ class TestProjectSnippet(unittest.TestCase):
             content = self.obj.Content()
             self.assertEqual(content, data)
 
+    def test_content_streamed_to_file(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'content')
+        try:
+            with HTTMock(self.resp_content):
+                size = self.obj.Content(streamed=True, action=path)
+            self.assertEqual(size, 7)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'content')
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_blob_fail(self):
         with HTTMock(self.resp_content_fail):
             self.assertRaises(GitlabGetError, self.obj.Content)
+
+
+class TestProject(unittest.TestCase):
+    def setUp(self):
+        self.gl = Gitlab("http://localhost", private_token="private_token",
+                         email="testuser@test.com", password="testpassword",
+                         ssl_verify=True)
+        self.obj = Project(self.gl, data={"name": "name", "id": 1})
+
+    def test_lazy_managers(self):
+        self.assertNotIn('branches', self.obj.__dict__)
+        as_dict = self.obj.as_dict()
+
+        branches = self.obj.branches
+        self.assertIsInstance(branches, ProjectBranchManager)
+        self.assertIs(branches.parent, self.obj)
+        self.assertIs(self.obj.branches, branches)
+        self.assertEqual(branches._set_parent_args(), {'project_id': 1})
+        self.assertEqual(self.obj.as_dict(), as_dict)
+
+        other = Project(self.gl, data={"name": "name", "id": 1})
+        self.assertIsNot(other.branches, branches)
+        self.assertEqual(other, self.obj)
+
+    def test_manager_hides_data(self):
+        obj = Group(self.gl, data={"id": 1, "members": [{"id": 2}]})
+        self.assertIsInstance(obj.members, GroupMemberManager)
+
+    @urlmatch(scheme="http", netloc="localhost",
+              path="/api/v3/projects/1/repository/archive",
+              method="get")
+    def resp_archive(self, url, request):
+        headers = {'content-type': 'application/octet-stream'}
+        content = 'archive content'.encode("utf-8")
+        return response(200, content, headers, None, 5, request)
+
+    def test_repository_archive(self):
+        with HTTMock(self.resp_archive):
+            self.assertEqual(self.obj.repository_archive(),
+                             b'archive content')
+
+    def test_repository_archive_streamed(self):
+        chunks = []
+        with HTTMock(self.resp_archive):
+            size = self.obj.repository_archive(streamed=True,
+                                               action=chunks.append,
+                                               chunk_size=4)
+        self.assertEqual(size, 15)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), b'archive content')
+
+        fd = six.BytesIO()
+        with HTTMock(self.resp_archive):
+            size = self.obj.repository_archive(streamed=True, action=fd)
+        self.assertEqual(size, 15)
+        self.assertEqual(fd.getvalue(), b'archive content')
@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
+import threading
 try:
     import unittest
 except ImportError:
@@ -23,8 +25,11 @@ except ImportError:
 from httmock import HTTMock  # noqa
 from httmock import response  # noqa
 from httmock import urlmatch  # noqa
+import mock
+import six
 
 from gitlab import *  # noqa
+from gitlab import transport
 from gitlab.objects import BaseManager  # noqa
 
 
@@ -166,6 +171,350 @@ class TestGitlabManager(unittest.TestCase):
             self.assertEqual(fake_obj.id, 1)
             self.assertEqual(fake_obj.name, "fake_name")
 
+    def test_create_many(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path="/api/v3/fake/1/fakechild", method="POST")
+        def resp_create(url, request):
+            headers = {'content-type': 'application/json'}
+            data = json.loads(request.body)
+            if data['name'] == 'bad':
+                return response(400, '{"message": "bad"}', headers, None, 5,
+                                request)
+            content = json.dumps({"id": 2, "name": data['name']})
+            return response(201, content.encode("utf-8"), headers, None, 5,
+                            request)
+
+        parent = FakeObject(self.gitlab, {"id": 1, "name": "parent"})
+        with HTTMock(resp_create):
+            results = parent.children.create_many(
+                [{"name": "a"}, {"name": "bad"}, {"name": "c"}], workers=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].name, "a")
+        self.assertEqual(results[0].parent_id, 1)
+        self.assertIsInstance(results[1], GitlabCreateError)
+        self.assertEqual(results[2].name, "c")
+
+    def test_delete_many(self):
+        deleted = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/fake/1/fakechild/\d+", method="DELETE")
+        def resp_delete(url, request):
+            deleted.append(url.path)
+            headers = {'content-type': 'application/json'}
+            if url.path.endswith('/3'):
+                return response(404, '{"message": "404 Not found"}', headers,
+                                None, 5, request)
+            return response(200, '', headers, None, 5, request)
+
+        mgr = FakeChildManager(self.gitlab)
+        self.gitlab.bulk_workers = 2
+        with HTTMock(resp_delete):
+            results = mgr.delete_many([1, 2, 3], parent_id=1)
+        self.assertEqual(results[:2], [True, True])
+        self.assertIsInstance(results[2], GitlabDeleteError)
+        self.assertEqual(len(deleted), 3)
+
+    def test_save_many(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/fake/\d+", method="PUT")
+        def resp_update(url, request):
+            headers = {'content-type': 'application/json'}
+            return response(200, request.body, headers, None, 5, request)
+
+        mgr = FakeObjectManager(self.gitlab)
+        objects = [FakeObject(self.gitlab, {"id": i, "name": "name"})
+                   for i in (1, 2)]
+        for obj in objects:
+            obj._from_api = True
+            obj.name = "new name"
+        with HTTMock(resp_update):
+            results = mgr.save_many(objects, workers=2)
+        self.assertEqual(results, objects)
+        self.assertEqual(objects[1].name, "new name")
+
+    def test_get_many(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/fake/\d+", method="GET")
+        def resp_get(url, request):
+            id = url.path.rsplit('/', 1)[1]
+            requested.append(id)
+            headers = {'content-type': 'application/json'}
+            if id == '3':
+                return response(404, '{"message": "404 Not found"}', headers,
+                                None, 5, request)
+            content = '{"id": %s, "name": "fake"}' % id
+            return response(200, content, headers, None, 5, request)
+
+        mgr = FakeObjectManager(self.gitlab)
+        with HTTMock(resp_get):
+            objs = mgr.get_many([2, 1], workers=2)
+            self.assertEqual([o.id for o in objs], [2, 1])
+            self.assertRaises(GitlabGetError, mgr.get_many, [1, 3])
+            objs = mgr.get_many([3, 1], on_missing='skip')
+            self.assertEqual([o.id for o in objs], [1])
+            objs, missing = mgr.get_many([1, 3, 2], on_missing='collect')
+            self.assertEqual([o.id for o in objs], [1, 2])
+            self.assertEqual(missing, [3])
+        self.assertEqual(sorted(requested), ['1', '1', '1', '1', '2', '2',
+                                             '3', '3', '3'])
+        self.assertRaises(ValueError, mgr.get_many, [1], on_missing='bad')
+
+    def test_get_many_from_list(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path="/api/v3/projects/1/repository/branches",
+                  method="GET")
+        def resp_list(url, request):
+            requested.append(url)
+            headers = {'content-type': 'application/json'}
+            content = '[{"name": "master"}, {"name": "dev"}]'
+            return response(200, content, headers, None, 5, request)
+
+        class FakeBranch(ProjectBranch):
+            canGet = 'from_list'
+
+        class FakeBranchManager(BaseManager):
+            obj_cls = FakeBranch
+
+        mgr = FakeBranchManager(self.gitlab)
+        with HTTMock(resp_list):
+            objs, missing = mgr.get_many(['dev', 'foo', 'master'],
+                                         on_missing='collect', project_id=1)
+        self.assertEqual([o.name for o in objs], ['dev', 'master'])
+        self.assertEqual(missing, ['foo'])
+        self.assertEqual(len(requested), 1)
+
+    def test_get_from_list_index(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/\d+/repository/tags",
+                  method="GET")
+        def resp_list(url, request):
+            requested.append(url.path)
+            headers = {'content-type': 'application/json'}
+            content = '[{"name": "v1"}, {"name": "v2"}]'
+            return response(200, content, headers, None, 5, request)
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1/repository/tags",
+                  method="POST")
+        def resp_create(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"name": "v3"}'
+            return response(201, content, headers, None, 5, request)
+
+        mgr = ProjectTagManager(self.gitlab)
+        with HTTMock(resp_list, resp_create):
+            tag = mgr.get('v1', project_id=1)
+            self.assertIs(mgr.get('v1', project_id=1), tag)
+            self.assertEqual(mgr.get('v2', project_id=1).name, 'v2')
+            self.assertEqual(len(requested), 1)
+
+            mgr.get('v1', project_id=2)
+            self.assertEqual(len(requested), 2)
+
+            # Unknown IDs refresh the index
+            self.assertRaises(GitlabGetError, mgr.get, 'v3', project_id=1)
+            self.assertEqual(len(requested), 3)
+
+            mgr.create({'tag_name': 'v3', 'ref': 'master'}, project_id=1)
+            mgr.get('v1', project_id=1)
+            self.assertEqual(len(requested), 4)
+
+    def test_get_from_list_index_limits(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/\d+/repository/tags",
+                  method="GET")
+        def resp_list(url, request):
+            requested.append(url.path)
+            headers = {'content-type': 'application/json'}
+            content = '[{"name": "v1"}, {"name": "v2"}]'
+            return response(200, content, headers, None, 5, request)
+
+        self.gitlab.list_index_max_entries = 2
+        mgr = ProjectTagManager(self.gitlab)
+        with HTTMock(resp_list):
+            for project_id in (1, 2, 3):
+                mgr.get('v1', project_id=project_id)
+            self.assertEqual(len(self.gitlab._list_indexes), 2)
+            # The index of the first project was dropped
+            mgr.get('v1', project_id=1)
+            self.assertEqual(len(requested), 4)
+
+            mgr.get('v1', project_id=1)
+            self.assertEqual(len(requested), 4)
+            now = transport._clock()
+            with mock.patch('gitlab.transport._clock',
+                            return_value=now + 61):
+                mgr.get('v1', project_id=1)
+            self.assertEqual(len(requested), 5)
+
+    def test_get_from_list_index_threads(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/\d+/repository/tags",
+                  method="GET")
+        def resp_list(url, request):
+            page = 2 if 'page=2' in url.query else 1
+            headers = {'content-type': 'application/json',
+                       'X-Total-Pages': '3'}
+            headers['link'] = ('<http://localhost%s?page=%d>; rel="next"' %
+                               (url.path, page + 1))
+            content = '[{"name": "v%d"}]' % page
+            return response(200, content, headers, None, 5, request)
+
+        self.gitlab.pagination_workers = 4
+        mgr = ProjectTagManager(self.gitlab)
+        threads = threading.active_count()
+        with HTTMock(resp_list):
+            for project_id in range(1, 11):
+                self.assertEqual(mgr.get('v2', project_id=project_id).name,
+                                 'v2')
+        # The indexes don't keep any page prefetching pool alive
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_get_from_list_index_object_delete(self):
+        keys = ['{"id": 5, "title": "k5"}', '{"id": 6, "title": "k6"}']
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/users/\d+/keys", method="GET")
+        def resp_list(url, request):
+            requested.append(url.path)
+            headers = {'content-type': 'application/json'}
+            content = '[%s]' % ', '.join(keys)
+            return response(200, content, headers, None, 5, request)
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/users/1/keys/5", method="DELETE")
+        def resp_delete(url, request):
+            keys.pop(0)
+            headers = {'content-type': 'application/json'}
+            return response(200, '{}', headers, None, 5, request)
+
+        mgr = UserKeyManager(self.gitlab)
+        with HTTMock(resp_list, resp_delete):
+            mgr.get(6, user_id=2)
+            key = mgr.get(5, user_id=1)
+            key.delete()
+            self.assertRaises(GitlabGetError, mgr.get, 5, user_id=1)
+            self.assertEqual(len(requested), 3)
+
+            # The indexes of the other users are kept
+            mgr.get(6, user_id=2)
+            self.assertEqual(len(requested), 3)
+
+    def test_get_from_list_pages(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path="/api/v3/projects/1/labels", method="GET")
+        def resp_list(url, request):
+            requested.append(url.query)
+            headers = {'content-type': 'application/json'}
+            if 'page=2' in url.query:
+                content = '[{"name": "label3"}]'
+            else:
+                content = '[{"name": "label1"}, {"name": "label2"}]'
+                headers['link'] = ('<http://localhost/api/v3/projects/1/'
+                                   'labels?page=2>; rel="next"')
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_list):
+            label = ProjectLabel.get(self.gitlab, 'label2', project_id=1)
+            self.assertEqual(label.name, 'label2')
+            self.assertEqual(len(requested), 1)
+            label = ProjectLabel.get(self.gitlab, 'label3', project_id=1)
+            self.assertEqual(label.name, 'label3')
+            self.assertEqual(len(requested), 3)
+
+            del requested[:]
+            mgr = ProjectLabelManager(self.gitlab)
+            mgr.get('label1', project_id=1)
+            self.assertEqual(len(requested), 1)
+            mgr.get('label2', project_id=1)
+            self.assertEqual(len(requested), 1)
+            # The index continues with the next page
+            mgr.get('label3', project_id=1)
+            self.assertEqual(len(requested), 2)
+
+    def test_get_lazy(self):
+        requested = []
+
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1(/issues/?)?$", method="GET")
+        def resp_get(url, request):
+            requested.append(url.path.rstrip('/'))
+            headers = {'content-type': 'application/json'}
+            if 'issues' in url.path:
+                content = '[{"id": 3, "title": "issue", "project_id": 1}]'
+            else:
+                content = ('{"id": 1, "name": "project", '
+                           '"description": "desc", "issues": []}')
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            project = self.gitlab.projects.get(1, lazy=True)
+            self.assertIsInstance(project, Project)
+            self.assertEqual(project.id, 1)
+            issues = project.issues.list()
+            self.assertEqual(issues[0].title, "issue")
+            self.assertEqual(requested, ['/api/v3/projects/1/issues'])
+
+            project.description = "new"
+            self.assertEqual(project.name, "project")
+            self.assertEqual(project.description, "new")
+            self.assertIsInstance(project.issues, ProjectIssueManager)
+            self.assertEqual(len(requested), 2)
+            self.assertRaises(AttributeError, getattr, project, 'missing')
+            self.assertEqual(len(requested), 2)
+
+    def test_get_lazy_print(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1", method="GET")
+        def resp_get(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"id": 1, "name": "project", "path": "project"}'
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            project = self.gitlab.projects.get(1, lazy=True)
+            with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+                project.display(False)
+        self.assertEqual(out.getvalue(), "id: 1\npath: project\n")
+
+    def test_get_lazy_missing(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/2", method="GET")
+        def resp_get(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"message": "404 Not found"}'
+            return response(404, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            project = self.gitlab.projects.get(2, lazy=True)
+            self.assertEqual(project.id, 2)
+            # The error of the deferred request is not an AttributeError
+            self.assertRaises(GitlabGetError, hasattr, project, 'name')
+
+    def test_get_lazy_as_dict(self):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path=r"/api/v3/projects/1", method="GET")
+        def resp_get(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"id": 1, "name": "project"}'
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_get):
+            project = self.gitlab.projects.get(1, lazy=True)
+            self.assertEqual(project, self.gitlab.projects.get(1))
+
     def test_project_manager_owned(self):
         mgr = ProjectManager(self.gitlab)
 
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+try:
+    import unittest
+except ImportError:
+    import unittest2 as unittest
+
+from httmock import HTTMock  # noqa
+from httmock import response  # noqa
+from httmock import urlmatch  # noqa
+import mock
+import requests
+
+from gitlab import *  # noqa
+from gitlab import transport
+
+
+class FakeResponse(object):
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_is_retryable(self):
+        policy = RetryPolicy(max_retries=2)
+        self.assertTrue(policy.is_retryable('get', 0, 503))
+        self.assertTrue(policy.is_retryable('GET', 1, 429))
+        self.assertTrue(policy.is_retryable('get', 0))
+        self.assertFalse(policy.is_retryable('get', 2, 503))
+        self.assertFalse(policy.is_retryable('get', 0, 404))
+        self.assertFalse(policy.is_retryable('post', 0, 503))
+        self.assertFalse(policy.is_retryable('post', 0))
+
+        policy = RetryPolicy(methods=['POST'])
+        self.assertTrue(policy.is_retryable('post', 0, 503))
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual(policy.get_backoff(0), 1)
+        self.assertEqual(policy.get_backoff(2), 4)
+        self.assertEqual(policy.get_backoff(3), 5)
+
+        policy = RetryPolicy(backoff_factor=1, jitter=True)
+        for attempt in range(5):
+            self.assertLessEqual(policy.get_backoff(attempt), 2 ** attempt)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_backoff=10, jitter=False)
+        self.assertEqual(policy.get_backoff(
+            0, FakeResponse({'Retry-After': '3'})), 3)
+        self.assertEqual(policy.get_backoff(
+            0, FakeResponse({'Retry-After': '120'})), 10)
+        self.assertEqual(policy.get_backoff(
+            0, FakeResponse({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})),
+            0)
+        self.assertEqual(policy.get_backoff(
+            0, FakeResponse({'Retry-After': 'garbage'})), 0.5)
+
+
+class TestRateLimiter(unittest.TestCase):
+    @mock.patch('time.sleep')
+    @mock.patch('gitlab.transport._clock')
+    def test_acquire(self, m_clock, m_sleep):
+        m_clock.return_value = 100.0
+        limiter = RateLimiter(2, burst=2)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0.5)
+        self.assertEqual(limiter.acquire(), 1.0)
+        self.assertEqual(m_sleep.call_count, 2)
+
+        # the bucket is refilled with time, up to the burst size
+        m_clock.return_value = 110.0
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0.5)
+
+    def test_default_burst(self):
+        self.assertEqual(RateLimiter(5).burst, 5)
+        self.assertEqual(RateLimiter(0.5).burst, 1)
+
+    def test_gitlab_requests(self):
+        limiter = RateLimiter(1)
+        limiter.acquire = mock.Mock()
+        gl = Gitlab("http://localhost", private_token="private_token",
+                    rate_limiter=limiter)
+
+        @urlmatch(scheme="http", netloc="localhost", path="/api/v3/projects/1")
+        def resp_cont(url, request):
+            headers = {'content-type': 'application/json'}
+            content = '{"name": "testproject"}'.encode("utf-8")
+            return response(200, content, headers, None, 5, request)
+
+        with HTTMock(resp_cont):
+            gl.get(Project, id=1)
+            gl._raw_put('/projects/1')
+        self.assertEqual(limiter.acquire.call_count, 2)
+
+
+class TestGitlabRetry(unittest.TestCase):
+    def setUp(self):
+        self.gl = Gitlab("http://localhost", private_token="private_token",
+                         retry=RetryPolicy(max_retries=2))
+        self.calls = []
+
+    def _resp(self, codes):
+        @urlmatch(scheme="http", netloc="localhost",
+                  path="/api/v3/projects/1")
+        def resp_cont(url, request):
+            self.calls.append(request.method)
+            code = codes.pop(0)
+            headers = {'content-type': 'application/json'}
+            content = '{"name": "testproject"}'.encode("utf-8")
+            return response(code, content, headers, None, 5, request)
+
+        return resp_cont
+
+    @mock.patch('time.sleep')
+    def test_retry_get(self, m_sleep):
+        with HTTMock(self._resp([503, 429, 200])):
+            data = self.gl.get(Project, id=1)
+        self.assertEqual(data, {"name": "testproject"})
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(m_sleep.call_count, 2)
+
+    @mock.patch('time.sleep')
+    def test_retry_exhausted(self, m_sleep):
+        with HTTMock(self._resp([503, 503, 503, 200])):
+            self.assertRaises(GitlabGetError, self.gl.get, Project, id=1)
+        self.assertEqual(len(self.calls), 3)
+
+    @mock.patch('time.sleep')
+    def test_no_retry_post(self, m_sleep):
+        with HTTMock(self._resp([503, 201])):
+            r = self.gl._raw_post('/projects/1')
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(m_sleep.called)
+
+
+class TestMiddlewares(unittest.TestCase):
+    @urlmatch(scheme="http", netloc="localhost", path="/api/v3/projects/1")
+    def resp_cont(self, url, request):
+        headers = {'content-type': 'application/json'}
+        content = '{"name": "testproject"}'.encode("utf-8")
+        return response(200, content, headers, None, 5, request)
+
+    def test_chain_order(self):
+        calls = []
+
+        class Recorder(Middleware):
+            def __init__(self, name):
+                self.name = name
+
+            def __call__(self, request, send):
+                calls.append(self.name)
+                return send(request)
+
+        def func_middleware(request, send):
+            calls.append('func')
+            request.params['foo'] = 'bar'
+            return send(request)
+
+        gl = Gitlab("http://localhost", private_token="private_token",
+                    middlewares=[Recorder('one'), func_middleware,
+                                 Recorder('two')])
+        with HTTMock(self.resp_cont):
+            r = gl._raw_get('/projects/1')
+        self.assertEqual(calls, ['one', 'func', 'two'])
+        self.assertIn('foo=bar', r.url)
+
+    def test_short_circuit(self):
+        class Cached(Middleware):
+            def __call__(self, request, send):
+                r = requests.Response()
+                r.status_code = 200
+                r._content = b'{"name": "cached"}'
+                return r
+
+        gl = Gitlab("http://localhost", private_token="private_token",
+                    middlewares=[Cached()])
+        self.assertEqual(gl.get(Project, id=1), {"name": "cached"})
+        self.assertEqual(gl.projects.get(1).name, "cached")
+
+    def test_builtin_middlewares(self):
+        retry = RetryPolicy()
+        limiter = RateLimiter(1)
+        gl = Gitlab("http://localhost", private_token="private_token",
+                    retry=retry, rate_limiter=limiter)
+        self.assertEqual(gl.middlewares, [retry, limiter])
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.calls = []
+        self.release = threading.Event()
+
+    def send(self, request):
+        self.calls.append(request)
+        self.release.wait()
+        if request.url.endswith('error'):
+            raise GitlabConnectionError('failed')
+        return mock.Mock(content=b'{}')
+
+    def _run(self, urls, calls, method='get', headers=None):
+        """Send the requests concurrently.
+
+        `calls` is the number of requests expected to reach `send`, the
+        other ones wait for them in the middleware.
+        """
+        results = [None] * len(urls)
+        headers = headers or [None] * len(urls)
+        waiters = []
+        wait = transport._Call.wait
+
+        def counting_wait(call):
+            waiters.append(call)
+            return wait(call)
+
+        def call(i, url):
+            request = transport.Request(method, url, headers=headers[i])
+            try:
+                results[i] = self.single_flight(request, self.send)
+            except GitlabConnectionError as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=call, args=(i, url))
+                   for i, url in enumerate(urls)]
+        with mock.patch.object(transport._Call, 'wait', counting_wait):
+            for thread in threads:
+                thread.start()
+            # Wait until all the threads have reached the middleware
+            deadline = time.time() + 5
+            while (len(self.calls) < calls or
+                   len(waiters) < len(urls) - calls):
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.001)
+            self.release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.calls), calls)
+        return results
+
+    def test_coalesce(self):
+        results = self._run(['http://localhost/projects/1'] * 4 +
+                            ['http://localhost/projects/2'], calls=2)
+        self.assertTrue(all(r is results[0] for r in results[:4]))
+        self.assertIsNot(results[4], results[0])
+        self.assertEqual(self.single_flight._calls, {})
+
+    def test_exception(self):
+        results = self._run(['http://localhost/error'] * 3, calls=1)
+        for r in results:
+            self.assertIsInstance(r, GitlabConnectionError)
+
+    def test_no_coalesce_post(self):
+        self._run(['http://localhost/projects'] * 3, calls=3, method='post')
+
+    def test_no_coalesce_conditional(self):
+        results = self._run(['http://localhost/projects/1'] * 2, calls=2,
+                            headers=[{'If-None-Match': '"abc"'}, None])
+        self.assertIsNot(results[0], results[1])
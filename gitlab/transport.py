@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Transport-level helpers for the GitLab connection."""
+
+from __future__ import division
+from __future__ import absolute_import
+import email.utils
+import random
+import threading
+import sys
+import time
+
+import six
+
+from gitlab.exceptions import GitlabConnectionError
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class Request(object):
+    """An HTTP request going through the middlewares.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The full URL of the request.
+        params (dict): The query string parameters.
+        data: The body of the request.
+        headers (dict): The HTTP headers.
+        stream (bool): Whether the response content should be streamed.
+        obj_cls: The `GitlabObject` class built from the response, if any.
+    """
+
+    def __init__(self, method, url, params=None, data=None, headers=None,
+                 stream=False, obj_cls=None):
+        self.method = method.upper()
+        self.url = url
+        self.params = params or {}
+        self.data = data
+        self.headers = headers or {}
+        self.stream = stream
+        self.obj_cls = obj_cls
+
+    def key(self):
+        """Return a hashable key identifying the request.
+
+        Requests with the same method, URL, parameters and private token
+        share the same key.
+        """
+        params = tuple(sorted((k, str(v)) for k, v in self.params.items()))
+        return (self.method, self.url, params,
+                self.headers.get('PRIVATE-TOKEN'))
+
+
+class Middleware(object):
+    """Base class for the request middlewares.
+
+    A middleware is a callable receiving a `Request` and the `send` function
+    of the next element of the chain. It returns a `requests.Response`,
+    usually by calling ``send(request)``, possibly several times or not at
+    all. Middlewares can be used to add caching, metrics, or any other
+    transport-level behavior::
+
+        class TimingMiddleware(gitlab.Middleware):
+            def __call__(self, request, send):
+                start = time.time()
+                try:
+                    return send(request)
+                finally:
+                    print(request.url, time.time() - start)
+
+        gl = gitlab.Gitlab(url, token, middlewares=[TimingMiddleware()])
+
+    Plain functions with the same signature can be used as well.
+    """
+
+    def __call__(self, request, send):
+        return send(request)
+
+
+class RetryPolicy(Middleware):
+    """Defines how failed requests are retried.
+
+    A request is retried when the server cannot be reached, or when it
+    answers with one of the `status_codes`. Only the idempotent `methods`
+    are retried by default.
+
+    The delay between two attempts grows exponentially
+    (``backoff_factor * 2 ** attempt``), with a random jitter, and is capped
+    to `max_backoff`. If the server sends a ``Retry-After`` header, its value
+    is used instead.
+
+    Args:
+        max_retries (int): Maximum number of retries for a request.
+        backoff_factor (float): Base delay, in seconds.
+        max_backoff (float): Maximum delay between two attempts, in seconds.
+        status_codes (list[int]): HTTP status codes to retry.
+        methods (list[str]): HTTP methods to retry.
+        jitter (bool): Whether to randomize the delays.
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60,
+                 status_codes=(429, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'),
+                 jitter=True):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.jitter = jitter
+
+    def is_retryable(self, method, attempt, status_code=None):
+        """Tell whether a request should be retried.
+
+        Args:
+            method (str): The HTTP method of the request.
+            attempt (int): Number of retries already performed.
+            status_code (int): The HTTP status code of the response, or None
+                if the server could not be reached.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if method.upper() not in self.methods:
+            return False
+        return status_code is None or status_code in self.status_codes
+
+    def get_backoff(self, attempt, response=None):
+        """Return the number of seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): Number of retries already performed.
+            response: The response of the failed attempt, if any.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        retry_after = None
+        if response is not None:
+            retry_after = self._parse_retry_after(
+                response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        backoff = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+        return backoff
+
+    def __call__(self, request, send):
+        attempt = 0
+        while True:
+            try:
+                r = send(request)
+            except GitlabConnectionError:
+                if not self.is_retryable(request.method, attempt):
+                    raise
+                time.sleep(self.get_backoff(attempt))
+                attempt += 1
+                continue
+
+            if not self.is_retryable(request.method, attempt, r.status_code):
+                return r
+            backoff = self.get_backoff(attempt, r)
+            r.close()
+            time.sleep(backoff)
+            attempt += 1
+
+    @staticmethod
+    def _parse_retry_after(value):
+        if not value:
+            return None
+        try:
+            return max(0, int(value))
+        except ValueError:
+            pass
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - time.time())
+
+
+class RateLimiter(Middleware):
+    """Thread-safe token bucket pacing the requests sent to a server.
+
+    Tokens are added to the bucket at `rate` tokens per second, up to `burst`
+    tokens. Each request consumes a token, and waits for one to be available
+    if the bucket is empty. A single limiter can be shared by several
+    `gitlab.Gitlab` objects using the same token.
+
+    Args:
+        rate (float): Number of requests allowed per second.
+        burst (int): Maximum number of requests that can be sent at once.
+            Defaults to `rate` (at least 1).
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = _clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request can be sent.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self):
+        """Take a token without waiting.
+
+        Returns:
+            float: The number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = _clock()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # The token is taken right away; concurrent callers see a
+            # negative balance and wait for their turn.
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def __call__(self, request, send):
+        self.acquire()
+        return send(request)
+
+
+class SingleFlight(Middleware):
+    """Coalesce the identical GET requests sent concurrently.
+
+    When several threads send the same request at the same time, only the
+    first one reaches the server. The other threads wait for its result and
+    get the same response (or exception). Conditional requests (with an
+    ``If-None-Match`` or ``If-Modified-Since`` header) are not coalesced,
+    since their response depends on the header.
+
+    Use it as the first middleware, so that the coalesced requests don't go
+    through the other middlewares::
+
+        gl = gitlab.Gitlab(url, token, middlewares=[gitlab.SingleFlight()])
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    _conditional_headers = ('If-None-Match', 'If-Modified-Since')
+
+    def __call__(self, request, send):
+        if (request.method != 'GET' or request.stream or
+                any(h in request.headers for h in self._conditional_headers)):
+            return send(request)
+
+        key = request.key()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            return call.wait()
+
+        try:
+            r = send(request)
+            # Load the body so that it can be read by all the callers
+            r.content
+            call.response = r
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return r
+
+
+class _Call(object):
+    """A request in progress in `SingleFlight`."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.exc_info = None
+
+    def wait(self):
+        self.done.wait()
+        if self.exc_info is not None:
+            six.reraise(*self.exc_info)
+        return self.response
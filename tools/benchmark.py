@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016 Gauvain Pocentek <gauvain@pocentek.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks for python-gitlab, run against a local stub GitLab server.
+
+The stub serves paginated API v3 responses for the projects, with a
+configurable number of items and latency. The results are written as JSON so
+that two runs can be compared:
+
+    python tools/benchmark.py --items 2000 --latency 0.005 -o before.json
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves import urllib
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import gitlab  # noqa
+
+PRIVATE_TOKEN = 'benchmark_token'
+
+
+def _project(project_id):
+    return {
+        'id': project_id,
+        'name': 'project-%d' % project_id,
+        'description': 'Benchmark project %d' % project_id,
+        'path': 'project-%d' % project_id,
+        'path_with_namespace': 'group/project-%d' % project_id,
+        'default_branch': 'master',
+        'public': False,
+        'visibility_level': 0,
+        'issues_enabled': True,
+        'merge_requests_enabled': True,
+        'wiki_enabled': True,
+        'snippets_enabled': False,
+        'created_at': '2016-01-01T00:00:00.000Z',
+        'last_activity_at': '2016-06-01T00:00:00.000Z',
+        'http_url_to_repo': 'http://localhost/group/project-%d.git' %
+                            project_id,
+        'web_url': 'http://localhost/group/project-%d' % project_id,
+        'tag_list': ['benchmark'],
+        'owner': {'id': 1, 'username': 'root', 'name': 'Administrator',
+                  'state': 'active'},
+        'namespace': {'id': 2, 'name': 'group', 'path': 'group'},
+    }
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve the /user and /projects resources of the API v3."""
+
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are sent separately, don't wait for the ACKs
+    disable_nagle_algorithm = True
+    _project_re = re.compile(r'^/api/v3/projects/(\d+)$')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        return json.loads(body) if body else {}
+
+    def _dispatch(self):
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+        parsed = urllib.parse.urlparse(self.path)
+        if self.headers.get('PRIVATE-TOKEN') != PRIVATE_TOKEN:
+            return self._send_json(401, {'message': '401 Unauthorized'})
+
+        if parsed.path == '/api/v3/user' and self.command == 'GET':
+            return self._send_json(200, {'id': 1, 'username': 'root',
+                                         'name': 'Administrator'})
+
+        if parsed.path == '/api/v3/projects':
+            if self.command == 'GET':
+                return self._list(parsed)
+            if self.command == 'POST':
+                data = _project(self.server.items + 1)
+                data.update(self._read_body())
+                return self._send_json(201, data)
+
+        match = self._project_re.match(parsed.path)
+        if match is not None:
+            project_id = int(match.group(1))
+            if not 0 < project_id <= self.server.items + 1:
+                return self._send_json(404, {'message': '404 Not found'})
+            data = _project(project_id)
+            if self.command == 'GET':
+                return self._send_json(200, data)
+            if self.command == 'PUT':
+                data.update(self._read_body())
+                return self._send_json(200, data)
+            if self.command == 'DELETE':
+                return self._send_json(200, data)
+
+        self._send_json(404, {'message': '404 Not found'})
+
+    def _list(self, parsed):
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        per_page = min(int(query.get('per_page', 20)), 100)
+        page = max(int(query.get('page', 1)), 1)
+        total = self.server.items
+        total_pages = max((total + per_page - 1) // per_page, 1)
+        start = (page - 1) * per_page
+        items = [_project(i)
+                 for i in range(start + 1, min(start + per_page, total) + 1)]
+
+        base = 'http://%s:%d%s' % (self.server.server_address[0],
+                                   self.server.server_address[1], parsed.path)
+        links = []
+        for rel, target in (('next', page + 1), ('first', 1),
+                            ('last', total_pages)):
+            if rel == 'next' and page >= total_pages:
+                continue
+            query['page'] = str(target)
+            query['per_page'] = str(per_page)
+            links.append('<%s?%s>; rel="%s"' %
+                         (base, urllib.parse.urlencode(sorted(query.items())),
+                          rel))
+        headers = {
+            'Link': ', '.join(links),
+            'X-Page': str(page),
+            'X-Per-Page': str(per_page),
+            'X-Total': str(total),
+            'X-Total-Pages': str(total_pages),
+        }
+        self._send_json(200, items, headers)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """In-process stub GitLab server.
+
+    Args:
+        items (int): Number of projects served by the listing.
+        latency (float): Delay (in seconds) added to each response.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, items=1000, latency=0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.items = items
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+def _timed(func, repeat):
+    """Run `func` `repeat` times, and return the individual durations."""
+    durations = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        durations.append(time.time() - start)
+    return durations
+
+
+def _stats(durations):
+    durations = sorted(durations)
+    return {
+        'min': durations[0],
+        'median': durations[len(durations) // 2],
+        'max': durations[-1],
+        'mean': sum(durations) / len(durations),
+    }
+
+
+def bench_listing(server, args):
+    """Measure the listing throughput, in objects per second."""
+    results = {}
+    for workers in sorted(set([1, args.pagination_workers])):
+        gl = gitlab.Gitlab(server.url, PRIVATE_TOKEN,
+                           pagination_workers=workers)
+        for mode in ('all', 'as_iterator', 'fields'):
+            if mode == 'all':
+                def func():
+                    gl.projects.list(all=True, per_page=args.per_page)
+            elif mode == 'as_iterator':
+                def func():
+                    for _ in gl.projects.list(all=True, as_iterator=True,
+                                              per_page=args.per_page):
+                        pass
+            else:
+                def func():
+                    gl.projects.list(all=True, per_page=args.per_page,
+                                     fields=['id', 'name'])
+
+            stats = _stats(_timed(func, args.repeat))
+            stats['objects_per_second'] = server.items / stats['median']
+            results['%s_workers_%d' % (mode, workers)] = stats
+    return results
+
+
+def bench_construction(server, args):
+    """Measure the object construction rate, without network access."""
+    gl = gitlab.Gitlab(server.url, PRIVATE_TOKEN)
+    data = [_project(i) for i in range(1, args.objects + 1)]
+
+    def func():
+        [gitlab.Project(gl, item) for item in data]
+
+    stats = _stats(_timed(func, args.repeat))
+    stats['objects_per_second'] = args.objects / stats['median']
+    return stats
+
+
+def bench_crud(server, args):
+    """Measure the latency of the get, create, update and delete calls."""
+    gl = gitlab.Gitlab(server.url, PRIVATE_TOKEN)
+    project = gl.projects.get(1)
+
+    def update():
+        project.description = 'updated %f' % time.time()
+        project.save()
+
+    operations = {
+        'get': lambda: gl.projects.get(1),
+        'create': lambda: gl.projects.create({'name': 'new'}),
+        'update': update,
+        'delete': lambda: gl.projects.delete(1),
+    }
+    results = {}
+    for name, func in sorted(operations.items()):
+        stats = _stats(_timed(func, args.crud_repeat))
+        stats['overhead'] = stats['median'] - server.latency
+        results[name] = stats
+    return results
+
+
+def bench_memory(server, args):
+    """Measure the memory used by the listed objects, in bytes per object."""
+    if tracemalloc is None:
+        return None
+
+    gl = gitlab.Gitlab(server.url, PRIVATE_TOKEN)
+    results = {}
+    for mode, kwargs in (('objects', {}),
+                         ('fields', {'fields': ['id', 'name']})):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            objects = gl.projects.list(all=True, per_page=args.per_page,
+                                       **kwargs)
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        results[mode] = (after - before) / len(objects)
+        del objects
+    return results
+
+
+def bench_cli(server, args):
+    """Measure the CLI startup time, and a listing through the CLI."""
+    tmpdir = tempfile.mkdtemp()
+    config_file = os.path.join(tmpdir, 'python-gitlab.cfg')
+    with open(config_file, 'w') as f:
+        f.write('[global]\ndefault = stub\n\n'
+                '[stub]\nurl = %s\nprivate_token = %s\n'
+                % (server.url, PRIVATE_TOKEN))
+
+    env = dict(os.environ)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    env['PYTHONPATH'] = os.pathsep.join([root, env.get('PYTHONPATH', '')])
+    script = 'import sys; from gitlab.cli import main; sys.exit(main())'
+    commands = {
+        'import': [sys.executable, '-c', 'import gitlab.cli'],
+        'help': [sys.executable, '-c', script, '--help'],
+        'project_list': [sys.executable, '-c', script, '-c', config_file,
+                         'project', 'list'],
+    }
+
+    def run(command):
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(command, env=env, stdout=devnull)
+
+    try:
+        return dict((name, _stats(_timed(lambda: run(command),
+                                         args.cli_repeat)))
+                    for name, command in sorted(commands.items()))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+BENCHMARKS = {
+    'listing': bench_listing,
+    'construction': bench_construction,
+    'crud': bench_crud,
+    'memory': bench_memory,
+    'cli': bench_cli,
+}
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run the python-gitlab benchmarks against a local stub "
+                    "server.")
+    parser.add_argument("--items", type=int, default=1000,
+                        help="Number of projects served by the stub.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Delay (in seconds) added to each response.")
+    parser.add_argument("--per-page", type=int, default=100,
+                        help="Number of items per page.")
+    parser.add_argument("--pagination-workers", type=int, default=4,
+                        help="Number of workers for the concurrent listing.")
+    parser.add_argument("--objects", type=int, default=10000,
+                        help="Number of objects built by the construction "
+                             "benchmark.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of runs of the listing and construction "
+                             "benchmarks.")
+    parser.add_argument("--crud-repeat", type=int, default=50,
+                        help="Number of runs of each CRUD operation.")
+    parser.add_argument("--cli-repeat", type=int, default=3,
+                        help="Number of runs of each CLI command.")
+    parser.add_argument("-b", "--benchmark", action='append',
+                        choices=sorted(BENCHMARKS),
+                        help="Benchmark to run. Can be used multiple times. "
+                             "All the benchmarks are run by default.")
+    parser.add_argument("-o", "--output",
+                        help="File to write the JSON results to. The results "
+                             "are written on stdout by default.")
+    return parser
+
+
+def main():
+    args = _build_parser().parse_args()
+
+    server = StubServer(items=args.items, latency=args.latency)
+    server.start()
+    try:
+        results = {}
+        for name in args.benchmark or sorted(BENCHMARKS):
+            print("Running %s..." % name, file=sys.stderr)
+            results[name] = BENCHMARKS[name](server, args)
+    finally:
+        server.stop()
+
+    output = {
+        'version': gitlab.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'parameters': dict((k, v) for k, v in six.iteritems(vars(args))
+                           if k not in ('benchmark', 'output')),
+        'requests': server.requests,
+        'results': results,
+    }
+    data = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()